@@ -0,0 +1,837 @@
+"""
+Замеры производительности обработки сертификатов.
+
+Запуск:
+    python benchmark.py parser [кол-во документов]
+    python benchmark.py sections [кол-во документов | папка с PDF]
+    python benchmark.py climate [кол-во лет]
+    python benchmark.py extract [кол-во документов | папка с PDF]
+    python benchmark.py cache [папка с PDF]
+    python benchmark.py ingest [размеры архива через запятую] [кол-во вставок]
+    python benchmark.py table [кол-во записей]
+    python benchmark.py filter [кол-во записей]
+    python benchmark.py store [кол-во записей]
+    python benchmark.py scroll [кол-во записей] [кол-во кадров]
+    python benchmark.py send [кол-во записей] [задержка сети, мс]
+    python benchmark.py sync [кол-во изменений] [задержка сети, мс]
+"""
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+import pandas as pd
+from PyQt6.QtCore import Qt, QModelIndex
+from PyQt6.QtGui import QColor, QPalette
+from PyQt6.QtWidgets import QApplication, QStyledItemDelegate, QTableView
+
+from database import Database
+from pdf_parser import PDFParser, PATTERN_SOURCES, PATTERN_FLAGS, PATTERNS, _CLEANUP_RE, clean_pages
+
+MARKI = ['LADA', 'HAVAL', 'GEELY', 'CHERY', 'KIA', 'HYUNDAI', 'VOLKSWAGEN', 'TOYOTA']
+KATEGORII = ['M1', 'M1', 'M1', 'N1', 'N2', 'M3']
+MESYACY = ['января', 'февраля', 'марта', 'апреля', 'мая', 'июня',
+           'июля', 'августа', 'сентября', 'октября', 'ноября', 'декабря']
+
+
+def make_certificate_text(seed: int, annex_lines: int = 0) -> str:
+    """
+    Собирает синтетический текст сертификата СБКТС в том виде, в каком его
+    возвращает extract_text_from_pdf.
+
+    Args:
+        seed: Зерно генератора, одинаковое зерно дает одинаковый текст
+        annex_lines: Количество строк приложений после основных данных
+    """
+    rnd = random.Random(seed)
+    vin = ''.join(rnd.choice('ABCDEFGHJKLMNPRSTUVWXYZ0123456789') for _ in range(17))
+    marka = rnd.choice(MARKI)
+    lines = [
+        f"№ ТС BY А-BY.{rnd.randint(1000, 9999)}.{rnd.randint(10000, 99999)}",
+        f"МАРКА {marka}",
+        f"КОММЕРЧЕСКОЕ НАИМЕНОВАНИЕ {marka} MODEL {rnd.randint(1, 9)}",
+        f"ТИП {rnd.choice(['GSP', 'TXL', 'B', 'DX'])}{rnd.randint(100, 999)}",
+        "ШАССИ ОТСУТСТВУЕТ",
+        f"ИДЕНТИФИКАЦИОННЫЙ НОМЕР (VIN) {vin}",
+        f"ГОД ВЫПУСКА {rnd.randint(2015, 2025)}",
+        f"КАТЕГОРИЯ {rnd.choice(KATEGORII)}",
+        f"ЭКОЛОГИЧЕСКИЙ КЛАСС {rnd.choice(['ПЯТЫЙ', 'ЧЕТВЕРТЫЙ'])}",
+        f"ЗАЯВИТЕЛЬ И ЕГО АДРЕС ООО \"ЗАЯВИТЕЛЬ {seed}\", Республика Беларусь, г. Минск,",
+        f"ул. Промышленная, д. {rnd.randint(1, 99)}",
+        f"ИЗГОТОВИТЕЛЬ И ЕГО АДРЕС {marka} MOTOR CO., LTD, Китай,",
+        f"провинция Хэбэй, г. Баодин, {rnd.randint(1, 999)}",
+        f"СБОРОЧНЫЙ ЗАВОД И ЕГО АДРЕС {marka} ASSEMBLY PLANT, Китай",
+        "ТРАНСПОРТНОЕ СРЕДСТВО",
+        "ОБЩИЕ ХАРАКТЕРИСТИКИ ТРАНСПОРТНОГО СРЕДСТВА",
+        f"Колесная формула/ведущие колеса 4x2/{rnd.choice(['передние', 'задние'])}",
+        f"Схема компоновки транспортного средства {rnd.choice(['переднеприводная', 'заднеприводная'])}",
+        f"Тип кузова/количество дверей {rnd.choice(['седан', 'универсал', 'хэтчбек'])}/{rnd.choice([4, 5])}",
+        f"Количество мест спереди/сзади 2/{rnd.choice([2, 3])}",
+        f"Масса транспортного средства в снаряженном состоянии, кг {rnd.randint(1100, 2100)}",
+        f"Технически допустимая максимальная масса транспортного средства, кг {rnd.randint(1600, 2800)}",
+        "Габаритные размеры, мм",
+        f"- длина {rnd.randint(4000, 5000)}",
+        f"- ширина {rnd.randint(1700, 1950)}",
+        f"- высота {rnd.randint(1400, 1800)}",
+        f"База, мм {rnd.randint(2500, 2900)}",
+        f"Колея передних/задних колес, мм {rnd.randint(1500, 1600)}/{rnd.randint(1500, 1600)}",
+        f"Двигатель внутреннего сгорания (марка, тип) {marka} {rnd.randint(100, 999)}, бензиновый,",
+        "четырехтактный, с турбонаддувом",
+        f"- количество и расположение цилиндров {rnd.choice([3, 4, 6])}, рядное",
+        f"- рабочий объем цилиндров, см³ {rnd.randint(1200, 2500)}",
+        f"- степень сжатия {rnd.randint(9, 12)},{rnd.randint(0, 9)}",
+        f"- максимальная мощность, кВт (мин-1) {rnd.randint(60, 180)} ({rnd.randint(50, 65)}00)",
+        "Топливо бензин",
+        "Система питания (тип) распределенный впрыск",
+        "Система выпуска и нейтрализации отработавших газов каталитический",
+        "нейтрализатор, глушитель",
+        f"Трансмиссия {rnd.choice(['механическая', 'автоматическая'])}",
+        "Сцепление (марка, тип) фрикционное, сухое",
+        f"Коробка передач (марка, тип) {rnd.choice(['механическая', 'автоматическая'])}, 6-ступенчатая",
+        "Подвеска (тип)",
+        "Передняя независимая, пружинная, типа Макферсон",
+        "Задняя полузависимая, пружинная",
+        "Рулевое управление (марка, тип) шестерня-рейка, с электроусилителем",
+        "Тормозные системы",
+        "- рабочая гидравлическая, двухконтурная, дисковые механизмы",
+        "- запасная использует контур рабочей тормозной системы",
+        "- стояночная с механическим приводом на задние колеса",
+        f"Шины {rnd.choice(['195/55 R16', '205/60 R16', '225/45 R17'])}",
+        "Оборудование транспортного средства транспортное средство оснащено",
+        f"устройством вызова экстренных оперативных служб, номер УВЭОС {rnd.randint(10 ** 8, 10 ** 9)}",
+        "Транспортное средство и его характеристики соответствуют требованиям",
+    ]
+    for i in range(annex_lines):
+        lines.append(f"Приложение {i // 40 + 1}, пункт {i}: сведения о комплектации и дополнительном оборудовании")
+    lines.append(f"Дата оформления \"{rnd.randint(1, 28):02d}\" {rnd.choice(MESYACY)} {rnd.randint(2023, 2025)}")
+    return '\n'.join(lines)
+
+
+def make_corpus(count: int) -> List[str]:
+    """Корпус синтетических сертификатов разной длины"""
+    return [make_certificate_text(i, annex_lines=(i % 5) * 60) for i in range(count)]
+
+
+def load_pdf_corpus(folder: str) -> List[str]:
+    """Корпус из текстов реальных PDF сертификатов в папке"""
+    parser = PDFParser()
+    texts = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for filename in sorted(os.listdir(folder)):
+            if filename.lower().endswith('.pdf'):
+                texts.append(parser.extract_text_from_pdf(os.path.join(folder, filename)))
+    return texts
+
+
+def _time_per_doc(func: Callable[[str], object], corpus: List[str], repeat: int = 5) -> float:
+    """Лучшее из repeat прогонов, мс на документ. Отладочный вывод парсера подавляется"""
+    best = float('inf')
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for text in corpus:
+                func(text)
+            best = min(best, time.perf_counter() - start)
+    return best / len(corpus) * 1000
+
+
+def bench_parser(count: str = '200'):
+    """Поиск полей: строковые паттерны через re.search против общего реестра скомпилированных"""
+    count = int(count)
+    corpus = make_corpus(count)
+
+    def search_raw(text):
+        for pattern in PATTERN_SOURCES.values():
+            re.search(pattern, text, PATTERN_FLAGS)
+
+    def search_compiled(text):
+        for pattern in PATTERNS.values():
+            pattern.search(text)
+
+    parser = PDFParser()
+    raw = _time_per_doc(search_raw, corpus)
+    compiled = _time_per_doc(search_compiled, corpus)
+    full = _time_per_doc(parser.parse_vehicle_data, corpus)
+    print(f"Документов: {count}, паттернов: {len(PATTERNS)}")
+    print(f"re.search со строками:     {raw:.3f} мс/док")
+    print(f"Скомпилированный реестр:   {compiled:.3f} мс/док ({raw / compiled:.2f}x)")
+    print(f"parse_vehicle_data целиком: {full:.3f} мс/док")
+
+
+def bench_sections(source: str = '200'):
+    """
+    Поиск полей по разделам против поиска по всему тексту.
+    Сначала сверяет результаты на эталонном корпусе, затем замеряет время.
+    """
+    corpus = load_pdf_corpus(source) if os.path.isdir(source) else make_corpus(int(source))
+    parser = PDFParser()
+
+    mismatches = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = [(parser.parse_vehicle_data(text, use_sections=False),
+                    parser.parse_vehicle_data(text)) for text in corpus]
+    for i, (expected, actual) in enumerate(results):
+        if expected != actual:
+            mismatches += 1
+            diff = [key for key in expected if expected[key] != actual.get(key)]
+            print(f"Документ {i}: расхождение в полях {diff}")
+
+    whole = _time_per_doc(lambda text: parser.parse_vehicle_data(text, use_sections=False), corpus)
+    sectioned = _time_per_doc(parser.parse_vehicle_data, corpus)
+    print(f"Документов: {len(corpus)}, расхождений с эталоном: {mismatches}")
+    print(f"Поиск по всему тексту: {whole:.3f} мс/док")
+    print(f"Поиск по разделам:     {sectioned:.3f} мс/док ({whole / sectioned:.2f}x)")
+
+
+def make_weather_sheet(years: int, readings_per_day: int = 3) -> pd.DataFrame:
+    """Лист погоды в том виде, в каком его возвращает read_excel_data"""
+    rnd = random.Random(years)
+    start = datetime(2025 - years, 1, 1)
+    moments = [start + timedelta(hours=24 / readings_per_day * i)
+               for i in range(years * 365 * readings_per_day)]
+    return pd.DataFrame({
+        'Дата': pd.to_datetime(moments).astype('datetime64[ns]'),
+        'Температура': [round(rnd.uniform(-25, 30), 1) for _ in moments],
+        'Влажность': [rnd.randint(30, 95) for _ in moments],
+    })
+
+
+def _legacy_climate_lookup(df: pd.DataFrame, date_str: str):
+    """Прежний поиск: определение колонок и фильтрация всего DataFrame на каждый вызов"""
+    date = datetime.strptime(date_str, '%d.%m.%Y')
+    date_col = temp_col = humid_col = None
+    for col in df.columns:
+        col_lower = col.lower()
+        if df[col].dtype == 'datetime64[ns]':
+            date_col = col
+        elif 'темп' in col_lower or 'temp' in col_lower:
+            temp_col = col
+        elif 'влаж' in col_lower or 'humid' in col_lower:
+            humid_col = col
+    row = df[df[date_col].dt.date == date.date()]
+    if row.empty:
+        return None
+    return {'temperature': float(row[temp_col].iloc[0]), 'humidity': float(row[humid_col].iloc[0])}
+
+
+def bench_climate(years: str = '10', lookups: str = '300'):
+    """Поиск погоды по дате: фильтрация DataFrame против индекса дата -> значения"""
+    years, lookups = int(years), int(lookups)
+    df = make_weather_sheet(years)
+    rnd = random.Random(0)
+    dates = [(datetime(2025 - years, 1, 1) + timedelta(days=rnd.randrange(years * 365))).strftime('%d.%m.%Y')
+             for _ in range(lookups)]
+
+    parser = PDFParser()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        parser.set_climate_data(df)
+        build = (time.perf_counter() - start) * 1000
+
+    for date_str in dates:
+        assert parser.get_climate_data(date_str) == _legacy_climate_lookup(df, date_str), date_str
+
+    legacy = _time_per_doc(lambda d: _legacy_climate_lookup(df, d), dates, repeat=3)
+    indexed = _time_per_doc(parser.get_climate_data, dates, repeat=3)
+    print(f"Строк погоды: {len(df)} ({years} лет), запросов: {lookups}")
+    print(f"Построение индекса (один раз): {build:.1f} мс")
+    print(f"Фильтрация DataFrame: {legacy:.4f} мс/запрос")
+    print(f"Индекс по дате:       {indexed:.4f} мс/запрос ({legacy / indexed:.0f}x)")
+
+
+FOOTERS = ['М.П.Стр.{}', 'ТРАНСПОРТНОЕ СРЕДСТВОМ.П.Стр.{}', 'ОБЩИЕ ХАРАКТЕРИСТИКИ ТРАНСПОРТНОГО СРЕДСТВАМ.П.Стр.{}']
+PAGE_HEADER = 'ТС BY А-BY.{}.{}Свидетельство о безопасности конструкции транспортного средства №'
+
+
+def make_certificate_pages(seed: int, main_pages: int = 4, annex_pages: int = 0) -> List[str]:
+    """
+    Сертификат, разбитый на страницы так, как их отдает page.extract_text():
+    колонтитул внизу страницы и продолжение колонтитула вверху следующей.
+    Приложения идут после даты оформления.
+    """
+    rnd = random.Random(seed)
+    lines = make_certificate_text(seed).split('\n')
+    per_page = -(-len(lines) // main_pages)
+    bodies = ['\n'.join(lines[i:i + per_page]) for i in range(0, len(lines), per_page)]
+    bodies += ['\n'.join(f"Приложение {n + 1}, пункт {i}: сведения о комплектации и дополнительном оборудовании"
+                          for i in range(60)) for n in range(annex_pages)]
+
+    pages = []
+    for number, body in enumerate(bodies, 1):
+        if number > 1:
+            body = PAGE_HEADER.format(rnd.randint(1000, 9999), rnd.randint(1000, 9999)) + body
+        if number < len(bodies):
+            body += '\n' + rnd.choice(FOOTERS).format(number)
+        pages.append(body)
+    return pages
+
+
+def bench_extract(source: str = '200'):
+    """
+    Постраничная очистка колонтитулов и ранняя остановка извлечения.
+
+    Для числа документов проверяет, что clean_pages дает тот же текст, что и
+    очистка всего текста целиком. Для папки с PDF сравнивает результат разбора
+    и время извлечения всех страниц и извлечения до даты оформления.
+    """
+    if not os.path.isdir(source):
+        count = int(source)
+        for seed in range(count):
+            pages = make_certificate_pages(seed, annex_pages=seed % 8)
+            assert ''.join(clean_pages(pages)) == _CLEANUP_RE.sub('', ''.join(pages)), seed
+        print(f"Документов: {count}, постраничная очистка совпадает с очисткой целиком")
+        return
+
+    parser = PDFParser()
+    files = [os.path.join(source, f) for f in sorted(os.listdir(source)) if f.lower().endswith('.pdf')]
+    with contextlib.redirect_stdout(io.StringIO()):
+        mismatches = [path for path in files
+                      if parser.parse_vehicle_data(parser.extract_text_from_pdf(path, stop_early=False))
+                      != parser.parse_vehicle_data(parser.extract_text_from_pdf(path))]
+    full = _time_per_doc(lambda path: parser.extract_text_from_pdf(path, stop_early=False), files, repeat=3)
+    early = _time_per_doc(parser.extract_text_from_pdf, files, repeat=3)
+    print(f"Документов: {len(files)}, расхождений в разборе: {len(mismatches)}")
+    for path in mismatches:
+        print(f"  {path}")
+    print(f"Все страницы:       {full:.2f} мс/док")
+    print(f"До даты оформления: {early:.2f} мс/док ({full / early:.2f}x)")
+
+
+def bench_cache(folder: str):
+    """Извлечение текста без кэша, с пустым кэшем и с заполненным кэшем"""
+    files = [os.path.join(folder, f) for f in sorted(os.listdir(folder)) if f.lower().endswith('.pdf')]
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            plain = PDFParser()
+            cached = PDFParser(text_cache_path=os.path.join(tmp_dir, 'pdf_text_cache.db'))
+        no_cache = _time_per_doc(plain.extract_text_from_pdf, files, repeat=1)
+        cold = _time_per_doc(cached.extract_text_from_pdf, files, repeat=1)
+        warm = _time_per_doc(cached.extract_text_from_pdf, files, repeat=3)
+        for path in files:
+            assert cached.extract_text_from_pdf(path) == plain.extract_text_from_pdf(path), path
+        cached.text_cache.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    print(f"Документов: {len(files)}")
+    print(f"Без кэша:         {no_cache:.2f} мс/док")
+    print(f"Пустой кэш:       {cold:.2f} мс/док")
+    print(f"Заполненный кэш:  {warm:.2f} мс/док ({no_cache / warm:.0f}x)")
+
+
+def _random_vin(rnd: random.Random) -> str:
+    return ''.join(rnd.choice('ABCDEFGHJKLMNPRSTUVWXYZ0123456789') for _ in range(17))
+
+
+def _fill_archive(db_path: str, rows: int, seed: int = 0):
+    """
+    Заполняет vehicles.db архивом из rows записей напрямую, минуя Database.
+    Заполнены типичные поля, остальные колонки пустые, как в реальном архиве.
+    """
+    rnd = random.Random(seed)
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO vehicles (filename, MARKA, KATEGORIA, VIN, GOD_VIPUSKA, NOMER_REGISTRACII, "
+            "TOPLIVO_TIP, DVIGATEL_MODEL, ZAYAVITEL, IZGOTOVITEL, DATA_OFORMLENIYA, suspicious, "
+            "temperature, humidity) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((f"archive_{i}.pdf", rnd.choice(MARKI), rnd.choice(KATEGORII), _random_vin(rnd),
+              str(rnd.randint(2018, 2024)), f"ТС RU Е-RU.{i}", rnd.choice(['бензин', 'дизель']),
+              f"{rnd.choice(MARKI)} {rnd.randint(100, 999)}", f'ООО "ЗАЯВИТЕЛЬ {rnd.randint(1, 200)}"',
+              f"{rnd.choice(MARKI)} MOTOR CO., LTD, Китай", f"{rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.2024",
+              int(rnd.random() < 0.02), round(rnd.uniform(15, 25), 1), round(rnd.uniform(30, 70), 1))
+             for i in range(rows))
+        )
+
+
+def bench_ingest(sizes: str = '10000,50000,100000', inserts: str = '300'):
+    """
+    Вставка через insert_vehicle_data в архив разного размера: с индексом по VIN
+    и без него. С индексом время на запись не должно расти вместе с архивом.
+    """
+    inserts = int(inserts)
+    rnd = random.Random(1)
+    records = [({'MARKA': rnd.choice(MARKI), 'VIN': _random_vin(rnd), 'GOD_VIPUSKA': '2024'}, f"new_{i}.pdf")
+               for i in range(inserts)]
+    # Каждая десятая запись - повтор VIN, чтобы срабатывала пометка дубликатов
+    for i in range(0, inserts, 10):
+        records[i][0]['VIN'] = records[i + 1][0]['VIN']
+
+    print(f"Вставок на замер: {inserts}")
+    print(f"{'Архив':>8} | {'без индекса, мс/запись':>22} | {'с индексом, мс/запись':>21}")
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for size in (int(x) for x in sizes.split(',')):
+            timings = {}
+            for indexed in (False, True):
+                db_path = os.path.join(tmp_dir, f"vehicles_{size}_{int(indexed)}.db")
+                with contextlib.redirect_stdout(io.StringIO()):
+                    Database(db_path).close()
+                _fill_archive(db_path, size)
+                if not indexed:
+                    # Схема до миграции 1; user_version уже 1, поэтому индекс не вернется
+                    with sqlite3.connect(db_path) as conn:
+                        conn.execute("DROP INDEX idx_vehicles_vin")
+
+                with contextlib.redirect_stdout(io.StringIO()):
+                    db = Database(db_path)
+                    start = time.perf_counter()
+                    for data, filename in records:
+                        db.insert_vehicle_data(dict(data), filename)
+                    timings[indexed] = (time.perf_counter() - start) * 1000 / inserts
+                db.close()
+            print(f"{size:>8} | {timings[False]:>22.3f} | {timings[True]:>21.3f}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _make_archive(tmp_dir: str, rows: int) -> str:
+    """Временная vehicles.db с архивом из rows записей"""
+    db_path = os.path.join(tmp_dir, f"vehicles_{rows}.db")
+    with contextlib.redirect_stdout(io.StringIO()):
+        Database(db_path).close()
+    _fill_archive(db_path, rows)
+    return db_path
+
+
+def _measure(func: Callable[[], object]):
+    """
+    Время (мс) и пик выделенной памяти (МБ) вызова. Память считается отдельным
+    прогоном: tracemalloc заметно замедляет выполнение
+    """
+    import tracemalloc
+    start = time.perf_counter()
+    result = func()
+    elapsed = (time.perf_counter() - start) * 1000
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def bench_table(rows: str = '80000'):
+    """Открытие просмотра: загрузка всей таблицы в TableModel и первая страница PagedTableModel"""
+    from table_db import TableModel, PagedTableModel
+
+    rows = int(rows)
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db_path = _make_archive(tmp_dir, rows)
+
+        def first_screen(model):
+            # Что отрисует представление при открытии: первые 40 строк всех колонок
+            for row in range(min(40, model.rowCount(None))):
+                for column in range(model.columnCount(None)):
+                    model.data(model.index(row, column), Qt.ItemDataRole.DisplayRole)
+            return model
+
+        def open_full():
+            conn = sqlite3.connect(db_path)
+            headers = [col[1] for col in conn.execute("PRAGMA table_info(vehicles)")]
+            data = [list(row) for row in conn.execute("SELECT * FROM vehicles")]
+            conn.close()
+            return first_screen(TableModel(data, headers))
+
+        full, full_ms, full_mb = _measure(open_full)
+        paged, paged_ms, paged_mb = _measure(lambda: first_screen(PagedTableModel(db_path)))
+        assert [paged.row_values(i) for i in range(paged.rowCount(None))] == \
+            [full.row_values(i) for i in range(paged.rowCount(None))]
+        paged.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    print(f"Записей: {rows}")
+    print(f"TableModel целиком:      {full_ms:8.1f} мс, {full_mb:7.1f} МБ")
+    print(f"PagedTableModel (стр. 1): {paged_ms:7.1f} мс, {paged_mb:7.1f} МБ")
+
+
+def bench_filter(rows: str = '100000'):
+    """
+    Фильтр по марке и сортировка по VIN: в памяти через CustomProxyModel над
+    TableModel и в SQL через PagedTableModel
+    """
+    from table_db import TableModel, PagedTableModel, CustomProxyModel
+
+    rows = int(rows)
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db_path = _make_archive(tmp_dir, rows)
+        conn = sqlite3.connect(db_path)
+        headers = [col[1] for col in conn.execute("PRAGMA table_info(vehicles)")]
+        data = [list(row) for row in conn.execute("SELECT * FROM vehicles")]
+        conn.close()
+        marka, vin = headers.index('MARKA'), headers.index('VIN')
+
+        def apply(proxy):
+            proxy.set_filter(marka, {'LADA', 'KIA'})
+            proxy.sort(vin, Qt.SortOrder.AscendingOrder)
+            return proxy
+
+        def timed(proxy):
+            start = time.perf_counter()
+            apply(proxy)
+            return (time.perf_counter() - start) * 1000
+
+        memory = CustomProxyModel()
+        memory.setSourceModel(TableModel(data, headers))
+        memory_ms = timed(memory)
+
+        paged = PagedTableModel(db_path)
+        sql = CustomProxyModel()
+        sql.setSourceModel(paged)
+        sql_ms = timed(sql)
+
+        first = [memory.data(memory.index(row, vin), Qt.ItemDataRole.DisplayRole) for row in range(100)]
+        assert first == [sql.data(sql.index(row, vin), Qt.ItemDataRole.DisplayRole) for row in range(100)]
+        start = time.perf_counter()
+        sql.fetchMore(QModelIndex())
+        page_ms = (time.perf_counter() - start) * 1000
+        paged.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    print(f"Записей: {rows}, после фильтра: {memory.rowCount(QModelIndex())}")
+    print(f"В памяти (прокси):  {memory_ms:8.1f} мс")
+    print(f"В SQL (первая стр.): {sql_ms:7.1f} мс, следующая страница {page_ms:.1f} мс")
+
+
+def bench_store(rows: str = '20000'):
+    """
+    Память, занимаемая строками архива в TableModel: список списков против
+    ColumnStore, и время получения отображаемых строк экрана (40 строк всех колонок)
+    """
+    import gc
+    import tracemalloc
+    from table_db import TableModel
+
+    rows = int(rows)
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db_path = _make_archive(tmp_dir, rows)
+        conn = sqlite3.connect(db_path)
+        columns_info = conn.execute("PRAGMA table_info(vehicles)").fetchall()
+        headers = [col[1] for col in columns_info]
+        types = {i: col[2].upper() for i, col in enumerate(columns_info)}
+
+        def retained(build):
+            # Сколько памяти остается занятой построенным объектом
+            gc.collect()
+            tracemalloc.start()
+            result = build()
+            gc.collect()
+            size = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+            tracemalloc.stop()
+            return result, size
+
+        def read_rows():
+            return [list(row) for row in conn.execute("SELECT * FROM vehicles")]
+
+        def build_model():
+            model = TableModel([], headers)
+            model.set_column_types(types)
+            model.append_rows(read_rows())
+            return model
+
+        data, lists_mb = retained(read_rows)
+        model, store_mb = retained(build_model)
+        assert all(model.row_values(row) == data[row] for row in range(rows))
+        conn.close()
+
+        # Ячейки запрашиваются так же, как в TableModel.data до и после ColumnStore
+        def screen_lists():
+            for row in range(40):
+                for column in range(len(headers)):
+                    str(data[row][column])
+
+        store = model._store
+        display_rows = store.display_rows
+
+        def screen_store():
+            for row in range(40):
+                for column in range(len(headers)):
+                    (display_rows.get(row) or store.display_row(row))[column]
+
+        def first_screen_store():
+            # Строки экрана еще не в кэше (прокрутка к новым строкам)
+            store._reset_display()
+            screen_store()
+
+        assert all(store.display_row(row) == [str(value) for value in data[row]] for row in range(min(rows, 1000)))
+        lists_ms = _time_per_doc(lambda _: screen_lists(), [None], repeat=50)
+        store_ms = _time_per_doc(lambda _: screen_store(), [None], repeat=50)
+        first_ms = _time_per_doc(lambda _: first_screen_store(), [None], repeat=50)
+        assert store_ms <= lists_ms, f"Перерисовка экрана из ColumnStore медленнее: {store_ms:.2f} > {lists_ms:.2f} мс"
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    print(f"Записей: {rows}, колонок: {len(headers)}")
+    print(f"Список списков: {lists_mb:7.1f} МБ, экран {lists_ms:.2f} мс")
+    print(f"ColumnStore:    {store_mb:7.1f} МБ, экран {store_ms:.2f} мс, новый экран {first_ms:.2f} мс")
+
+
+class _LegacyEmptyCellDelegate(QStyledItemDelegate):
+    """Прежняя отрисовка: str().strip() и смешивание цветов на каждую пустую ячейку"""
+    def paint(self, painter, option, index):
+        value = index.data(Qt.ItemDataRole.DisplayRole)
+        if value is None or str(value).strip() == '':
+            original_color = option.palette.base().color()
+            yellow_color = QColor(255, 255, 0, 30)
+            mixed_color = QColor(
+                int(original_color.red() * 0.85 + yellow_color.red() * 0.15),
+                int(original_color.green() * 0.85 + yellow_color.green() * 0.15),
+                int(original_color.blue() * 0.85 + yellow_color.blue() * 0.15)
+            )
+            palette = option.palette
+            palette.setColor(QPalette.ColorRole.Base, mixed_color)
+            option.palette = palette
+            painter.fillRect(option.rect, mixed_color)
+            if value is not None:
+                painter.drawText(option.rect, Qt.AlignmentFlag.AlignCenter, str(value))
+        else:
+            super().paint(painter, option, index)
+
+
+def bench_scroll(rows: str = '20000', frames: str = '200'):
+    """
+    Кадров в секунду при прокрутке таблицы с EmptyCellDelegate и с прежней
+    отрисовкой. Необязательные текстовые поля архива делаются пустыми строками,
+    как у сертификатов с незаполненными разделами
+    """
+    from table_db import TableModel, EmptyCellDelegate
+
+    rows, frames = int(rows), int(frames)
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db_path = _make_archive(tmp_dir, rows)
+        conn = sqlite3.connect(db_path)
+        columns_info = conn.execute("PRAGMA table_info(vehicles)").fetchall()
+        for col in columns_info:
+            if col[2].upper().startswith('TEXT'):
+                conn.execute(f'UPDATE vehicles SET "{col[1]}" = \'\' WHERE "{col[1]}" IS NULL')
+        model = TableModel([], [col[1] for col in columns_info])
+        model.set_column_types({i: col[2].upper() for i, col in enumerate(columns_info)})
+        model.append_rows([list(row) for row in conn.execute("SELECT * FROM vehicles")])
+        conn.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def fps(delegate):
+        view = QTableView()
+        view.setModel(model)
+        view.setItemDelegate(delegate)
+        view.resize(1600, 900)
+        view.show()
+        app.processEvents()
+        bar = view.verticalScrollBar()
+        step = max(1, bar.maximum() // frames)
+        start = time.perf_counter()
+        for frame in range(frames):
+            bar.setValue(frame * step)
+            view.viewport().repaint()
+        elapsed = time.perf_counter() - start
+        view.close()
+        return frames / elapsed
+
+    legacy = fps(_LegacyEmptyCellDelegate())
+    cached = fps(EmptyCellDelegate())
+    print(f"Записей: {rows}, кадров: {frames}")
+    print(f"Прежняя отрисовка:  {legacy:6.1f} кадр/с")
+    print(f"EmptyCellDelegate:  {cached:6.1f} кадр/с")
+
+
+class _FakeMySQL:
+    """
+    Замена соединения и курсора MySQL для замеров без сервера: каждый
+    обмен с сервером (execute, executemany, commit) стоит rtt секунд,
+    как запрос по медленному каналу
+    """
+    def __init__(self, rtt: float, user_data: List[dict] = None):
+        self.rtt = rtt
+        self.round_trips = 0
+        self.inserted = []
+        self.user_data = user_data or []  # Строки user_data с updated = 1
+        self.acknowledged = []
+
+    def _round_trip(self):
+        self.round_trips += 1
+        time.sleep(self.rtt)
+
+    def cursor(self, dictionary=False):
+        return self
+
+    def execute(self, query, params=None):
+        self._round_trip()
+        query = ' '.join(query.split())
+        if query.startswith('INSERT'):
+            self.inserted.append(params)
+        elif query.startswith('UPDATE user_data'):
+            self.acknowledged.extend(params)
+        elif query.startswith('SELECT data_id'):
+            self._result = self.user_data
+            if 'data_id > %s' in query:
+                # Страница изменений после data_id
+                last_id, limit = params
+                self._result = [row for row in self.user_data if row['data_id'] > last_id][:limit]
+            elif 'data_id IN' in query:
+                self._result = [row for row in self.user_data if row['data_id'] in params]
+
+    def fetchall(self):
+        return self._result
+
+    def executemany(self, query, seq_params):
+        # mysql.connector собирает INSERT из executemany в один запрос
+        self._round_trip()
+        self.inserted.extend(seq_params)
+
+    def fetchone(self):
+        return {'user_id': 1}
+
+    def commit(self):
+        self._round_trip()
+
+    def close(self):
+        pass
+
+
+def bench_send(rows: str = '2000', rtt_ms: str = '20'):
+    """
+    Отправка строк на редактирование: по INSERT на строку и пачками
+    send_to_mysql, объем data в прежнем, компактном и сжатом формате
+    """
+    from sql_to_myaql import DataSync, decode_payload
+
+    rows, rtt = int(rows), float(rtt_ms) / 1000
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        conn = sqlite3.connect(_make_archive(tmp_dir, rows))
+        conn.row_factory = sqlite3.Row
+        data = [dict(row) for row in conn.execute("SELECT * FROM vehicles")]
+        conn.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # Прежняя отправка: INSERT на каждую строку
+    legacy = _FakeMySQL(rtt)
+    start = time.perf_counter()
+    legacy.execute("SELECT user_id FROM users WHERE user_id = %s", (1,))
+    for row in data:
+        legacy.execute("INSERT INTO user_data (user_id, data, updated) VALUES (%s, %s, 1)", (1, json.dumps(row)))
+    legacy.commit()
+    legacy_s = time.perf_counter() - start
+
+    batched = _FakeMySQL(rtt)
+    sync = DataSync({}, '')
+    sync._connect_mysql = lambda: (batched, batched)
+    chunks = []
+    start = time.perf_counter()
+    assert sync.send_to_mysql(data, 1, progress=lambda sent, total: chunks.append(sent))
+    batched_s = time.perf_counter() - start
+    expected = [{column: value for column, value in row.items() if value is not None} for row in data]
+    assert [decode_payload(payload) for _, payload in batched.inserted] == expected
+
+    compressed = _FakeMySQL(0)
+    sync._connect_mysql = lambda: (compressed, compressed)
+    assert sync.send_to_mysql(data, 1, compress=True)
+    assert [decode_payload(payload) for _, payload in compressed.inserted] == expected
+
+    def data_size(fake):
+        return sum(len(payload.encode('utf-8')) for _, payload in fake.inserted) / 1024 / 1024
+
+    print(f"Записей: {rows}, задержка: {rtt_ms} мс, пачек: {len(chunks)}")
+    print(f"По строке:  {legacy_s:7.2f} с, обменов с сервером: {legacy.round_trips}, data: {data_size(legacy):.2f} МБ")
+    print(f"Пачками:    {batched_s:7.2f} с, обменов с сервером: {batched.round_trips}, data: {data_size(batched):.2f} МБ")
+    print(f"Со сжатием: data: {data_size(compressed):.2f} МБ")
+
+
+def bench_sync(changes: str = '10000', rtt_ms: str = '20'):
+    """
+    Применение правок из user_data к vehicles: UPDATE и подтверждение на
+    каждую правку против executemany по наборам колонок и IN по пачкам
+    """
+    from sql_to_myaql import DataSync, SYNC_PAGE_SIZE, encode_payload
+
+    changes, rtt = int(changes), float(rtt_ms) / 1000
+    rows = max(changes // 2, 1)
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db_path = _make_archive(tmp_dir, rows)
+        ids = [row[0] for row in sqlite3.connect(db_path).execute("SELECT id FROM vehicles")]
+        rng = random.Random(0)
+        user_data = []
+        for data_id in range(1, changes + 1):
+            # Правки разных наборов колонок, часть записей правится несколько раз
+            data = {'id': rng.choice(ids), 'MARKA': rng.choice(MARKI)}
+            if data_id % 3 == 0:
+                data['KATEGORIA'] = rng.choice(KATEGORII)
+            if data_id % 5 == 0:
+                data['GOD_VIPUSKA'] = str(rng.randint(2015, 2024))
+            user_data.append({'data_id': data_id, 'user_id': 1, 'data': json.dumps(data)})
+
+        # Прежнее применение: UPDATE на правку и подтверждение на правку
+        legacy_path = shutil.copy(db_path, os.path.join(tmp_dir, 'legacy.db'))
+        legacy = _FakeMySQL(rtt, user_data)
+        start = time.perf_counter()
+        conn = sqlite3.connect(legacy_path)
+        legacy.execute("SELECT data_id, user_id, data FROM user_data WHERE updated = 1")
+        for change in legacy.fetchall():
+            data = json.loads(change['data'])
+            record_id = data.pop('id')
+            conn.execute(f"UPDATE vehicles SET {', '.join(f'{column} = ?' for column in data)} WHERE id = ?",
+                         list(data.values()) + [record_id])
+            legacy.execute("UPDATE user_data SET updated = 0 WHERE data_id = %s", (change['data_id'],))
+        conn.commit()
+        legacy.commit()
+        legacy_s = time.perf_counter() - start
+
+        # Записи в прежнем, компактном и сжатом формате вперемешку
+        mixed = [dict(change, data=encode_payload(json.loads(change['data']), compress=change['data_id'] % 4 == 1))
+                 if change['data_id'] % 2 else change for change in user_data]
+        batched = _FakeMySQL(rtt, mixed)
+        sync = DataSync({}, db_path)
+        sync._connect_mysql = lambda: (batched, batched)
+        sync._release_mysql = lambda conn, cursor, broken=False: None
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert sync.sync_with_sqlite()
+        batched_s = time.perf_counter() - start
+        pages = -(-changes // SYNC_PAGE_SIZE)
+
+        query = "SELECT * FROM vehicles ORDER BY id"
+        assert sqlite3.connect(db_path).execute(query).fetchall() == \
+            sqlite3.connect(legacy_path).execute(query).fetchall()
+        assert sorted(batched.acknowledged) == sorted(legacy.acknowledged)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    print(f"Правок: {changes}, записей: {rows}, задержка: {rtt_ms} мс")
+    print(f"По правке:  {legacy_s:7.2f} с, обменов с сервером: {legacy.round_trips}")
+    print(f"Пачками:    {batched_s:7.2f} с, обменов с сервером: {batched.round_trips}, страниц: {pages}")
+
+
+BENCHMARKS = {
+    'parser': bench_parser,
+    'sections': bench_sections,
+    'climate': bench_climate,
+    'extract': bench_extract,
+    'cache': bench_cache,
+    'ingest': bench_ingest,
+    'table': bench_table,
+    'filter': bench_filter,
+    'store': bench_store,
+    'scroll': bench_scroll,
+    'send': bench_send,
+    'sync': bench_sync,
+}
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args or args[0] not in BENCHMARKS:
+        print(f"Использование: python benchmark.py [{'|'.join(BENCHMARKS)}] [параметр]")
+        sys.exit(1)
+    BENCHMARKS[args[0]](*args[1:])
@@ -0,0 +1,306 @@
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# Типы колонок SQLite, значения которых хранятся в типизированных массивах
+ARRAY_TYPECODES = {'INTEGER': 'q', 'REAL': 'd'}
+# Остальные колонки хранятся кодами значений, пока разных значений не больше
+# этого числа (коды - 2 байта на ячейку). Колонки вроде VIN, где значения почти
+# не повторяются, переходят на обычный список
+DICTIONARY_LIMIT = 4096
+# Размер кэша отображаемых строк числовой колонки
+DISPLAY_CACHE_LIMIT = 65536
+# Сколько строк таблицы хранится готовыми списками отображаемых строк (экран
+# перерисовывается много раз: наведение, выделение, прокрутка на строку)
+DISPLAY_ROWS_LIMIT = 512
+
+
+def _affinity(value: str, typecode: str):
+    """
+    Строка, записываемая в числовую колонку, приводится к числу, как это
+    делает SQLite для колонок INTEGER и REAL. Не число - остается строкой
+    """
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    if typecode == 'q':
+        try:
+            return int(value)
+        except ValueError:
+            return int(number) if number.is_integer() else number
+    return number
+
+
+class Column:
+    """
+    Значения одной колонки в одном из трех видов:
+
+    - array: INTEGER и REAL в array с отдельной отметкой NULL на строку;
+    - codes: номер значения в словаре колонки (MARKA, KATEGORIA, TOPLIVO_TIP и
+      пустые необязательные поля), одинаковые строки хранятся одним объектом;
+    - list: обычный список, если значений слишком много или в числовую колонку
+      попало значение другого типа (SQLite этого не запрещает).
+    """
+
+    def __init__(self, column_type: Optional[str] = None):
+        typecode = ARRAY_TYPECODES.get(column_type)
+        self.display_cache: Dict[Any, str] = {}  # Число -> отображаемая строка
+        if typecode:
+            self.kind = 'array'
+            self.values = array(typecode)
+            self.nulls = bytearray()  # 1 - значение NULL
+        else:
+            self.kind = 'codes'
+            self.values = array('H')
+            self.dictionary: List[Any] = [None]  # Код -> значение, 0 - NULL
+            self.display_strings: List[str] = ['None']  # Код -> отображаемая строка
+            self.blank = bytearray(1)  # Код -> 1, если отображаемая строка пустая
+            self.codes: Dict[Any, int] = {None: 0}  # Значение -> код
+
+    def __len__(self):
+        return len(self.values)
+
+    def _to_list(self):
+        """Переводит колонку на список произвольных значений"""
+        self.values = [self.get(row) for row in range(len(self.values))]
+        self.kind = 'list'
+        self.nulls = self.dictionary = self.display_strings = self.blank = self.codes = None
+        self.display_cache = {}
+
+    def _code(self, value) -> Optional[int]:
+        """Код значения; новый код добавляется в словарь. None, если словарь переполнен"""
+        # 1, 1.0 и True равны как ключи словаря, но отображаются по-разному
+        key = value if value is None or value.__class__ is str else (value.__class__, value)
+        code = self.codes.get(key)
+        if code is None:
+            if len(self.dictionary) >= DICTIONARY_LIMIT:
+                return None
+            code = self.codes[key] = len(self.dictionary)
+            self.dictionary.append(value)
+            text = str(value)
+            self.display_strings.append(text)
+            self.blank.append(not text.strip())
+        return code
+
+    def extend(self, values: List[Any]):
+        """Добавляет значения колонки для пачки строк"""
+        if self.kind == 'codes':
+            # Коды ищутся по словарю без цикла на Python: сначала в словарь
+            # добавляются новые значения пачки, затем пачка просматривается еще раз
+            codes = self.codes
+            found = list(map(codes.get, values))
+            if None in found:
+                for value in dict.fromkeys(value for value, code in zip(values, found) if code is None):
+                    if self._code(value) is None:
+                        self._to_list()
+                        self.values.extend(values)
+                        return
+                found = list(map(codes.get, values))
+                if None in found:
+                    # Нестроковые значения ищутся по ключу с типом
+                    found = [self._code(value) if code is None else code for value, code in zip(values, found)]
+                    if None in found:
+                        self._to_list()
+                        self.values.extend(values)
+                        return
+            self.values.extend(found)
+            return
+        if self.kind == 'array':
+            count = len(self.values)
+            try:
+                if None in values:
+                    self.values.extend([0 if value is None else value for value in values])
+                    self.nulls.extend([value is None for value in values])
+                else:
+                    self.values.extend(values)
+                    self.nulls.extend(bytes(len(values)))
+                return
+            except (TypeError, OverflowError):
+                # Часть пачки могла успеть попасть в массив
+                del self.values[count:]
+                del self.nulls[count:]
+                self._to_list()
+        self.values.extend(values)
+
+    def get(self, row: int):
+        if self.kind == 'codes':
+            return self.dictionary[self.values[row]]
+        if self.kind == 'array' and self.nulls[row]:
+            return None
+        return self.values[row]
+
+    def set(self, row: int, value):
+        if self.kind == 'array' and value.__class__ is str:
+            # Значение из диалога редактирования приходит строкой
+            value = _affinity(value, self.values.typecode)
+        if self.kind == 'codes':
+            code = self._code(value)
+            if code is not None:
+                self.values[row] = code
+                return
+            self._to_list()
+        elif self.kind == 'array':
+            try:
+                self.values[row] = 0 if value is None else value
+                self.nulls[row] = value is None
+                return
+            except (TypeError, OverflowError):
+                self._to_list()
+        self.values[row] = value
+
+    def display(self, row: int) -> str:
+        """Значение ячейки так, как его показывает таблица (str)"""
+        if self.kind == 'codes':
+            return self.display_strings[self.values[row]]
+        if self.kind == 'list':
+            value = self.values[row]
+            return value if value.__class__ is str else str(value)
+        if self.nulls[row]:
+            return 'None'
+        value = self.values[row]
+        text = self.display_cache.get(value)
+        if text is None:
+            if len(self.display_cache) >= DISPLAY_CACHE_LIMIT:
+                self.display_cache.clear()
+            text = self.display_cache[value] = str(value)
+        return text
+
+    def is_blank(self, row: int) -> bool:
+        """Отображаемая строка пустая или из одних пробелов"""
+        if self.kind == 'codes':
+            return self.blank[self.values[row]] == 1
+        if self.kind == 'list':
+            return not self.display(row).strip()
+        # Число или 'None' пустыми не бывают
+        return False
+
+    def delete(self, start: int, end: int):
+        """Удаляет строки start..end-1"""
+        del self.values[start:end]
+        if self.kind == 'array':
+            del self.nulls[start:end]
+
+    def take(self, rows: List[int]) -> List[Any]:
+        """Значения строк rows"""
+        taken = map(self.values.__getitem__, rows)
+        if self.kind == 'codes':
+            return list(map(self.dictionary.__getitem__, taken))
+        if self.kind == 'array' and any(map(self.nulls.__getitem__, rows)):
+            return [None if self.nulls[row] else self.values[row] for row in rows]
+        return list(taken)
+
+    def keep(self, rows: List[int]):
+        """Оставляет только строки rows (по возрастанию)"""
+        taken = map(self.values.__getitem__, rows)
+        self.values = list(taken) if self.kind == 'list' else array(self.values.typecode, taken)
+        if self.kind == 'array':
+            self.nulls = bytearray(map(self.nulls.__getitem__, rows))
+
+
+class ColumnStore:
+    """
+    Колоночное хранилище строк таблицы vehicles для TableModel.
+
+    Вместо списка списков разнотипных объектов хранит по колонке (см. Column)
+    и готовые отображаемые строки. row() собирает список значений строки
+    заново, поэтому изменения идут только через set(). Отображаемые строки
+    последних DISPLAY_ROWS_LIMIT прочитанных строк таблицы кэшируются
+    списками: display_rows (только для чтения) и display_row().
+    """
+
+    def __init__(self, column_count: int, column_types: Optional[Dict[int, str]] = None,
+                 rows: Optional[Iterable[List[Any]]] = None):
+        column_types = column_types or {}
+        self.columns = [Column(column_types.get(column)) for column in range(column_count)]
+        self.display_rows: Dict[int, List[str]] = {}
+        # (колонка, display_strings, values) колонок-кодов и прочие колонки
+        # для сборки строки без вызова метода на каждую ячейку
+        self._accessors = None
+        if rows:
+            self.append_rows(rows)
+
+    def _reset_display(self, rows: bool = True):
+        """Сбрасывает кэш отображаемых строк (rows) и списки доступа к колонкам"""
+        if rows:
+            self.display_rows.clear()
+        self._accessors = None
+
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    def append_rows(self, rows: Iterable[List[Any]]):
+        rows = list(rows)
+        if not rows:
+            return
+        # Пачка обрабатывается по колонкам
+        for column, values in zip(self.columns, zip(*rows)):
+            column.extend(list(values))
+        # Колонка могла перейти на список, показ прежних строк не изменился
+        self._reset_display(rows=False)
+
+    def rows(self) -> Iterator[List[Any]]:
+        for row in range(len(self)):
+            yield self.row(row)
+
+    def row(self, row: int) -> List[Any]:
+        return [column.get(row) for column in self.columns]
+
+    def take(self, rows: List[int]) -> List[List[Any]]:
+        """Значения многих строк, собранные по колонкам"""
+        return [list(values) for values in zip(*(column.take(rows) for column in self.columns))]
+
+    def get(self, row: int, column: int):
+        return self.columns[column].get(row)
+
+    def set(self, row: int, column: int, value):
+        target = self.columns[column]
+        kind = target.kind
+        target.set(row, value)
+        self.display_rows.pop(row, None)
+        if target.kind != kind:
+            self._reset_display(rows=False)
+
+    def display(self, row: int, column: int) -> str:
+        return self.display_row(row)[column]
+
+    def display_row(self, row: int) -> List[str]:
+        """Отображаемые строки всех колонок строки row (список из кэша, не изменять)"""
+        texts = self.display_rows.get(row)
+        if texts is None:
+            if self._accessors is None:
+                self._accessors = (
+                    [(i, column.display_strings, column.values)
+                     for i, column in enumerate(self.columns) if column.kind == 'codes'],
+                    [(i, column) for i, column in enumerate(self.columns) if column.kind != 'codes'],
+                )
+            codes, others = self._accessors
+            texts = [None] * len(self.columns)
+            for i, strings, values in codes:
+                texts[i] = strings[values[row]]
+            for i, column in others:
+                texts[i] = column.display(row)
+            if len(self.display_rows) >= DISPLAY_ROWS_LIMIT:
+                self.display_rows.clear()
+            self.display_rows[row] = texts
+        return texts
+
+    def is_blank(self, row: int, column: int) -> bool:
+        return self.columns[column].is_blank(row)
+
+    def column_values(self, column: int) -> Iterator[Any]:
+        target = self.columns[column]
+        for row in range(len(target)):
+            yield target.get(row)
+
+    def delete(self, start: int, end: int):
+        """Удаляет строки start..end-1"""
+        for column in self.columns:
+            column.delete(start, end)
+        self._reset_display()
+
+    def delete_rows(self, rows: set):
+        """Удаляет произвольный набор строк за один проход по колонке"""
+        kept = [row for row in range(len(self)) if row not in rows]
+        for column in self.columns:
+            column.keep(kept)
+        self._reset_display()
@@ -1,18 +1,98 @@
 import sqlite3
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Set, Tuple
+from collections import Counter
 import os
 from PyQt6.QtCore import QThread
 import traceback
 
+def _fill_column_stats(conn: sqlite3.Connection):
+    """Длины значений всех колонок vehicles за один проход по таблице"""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(vehicles)")]
+    query = "SELECT " + ", ".join(
+        f'MAX(LENGTH("{column}")), TOTAL(LENGTH("{column}")), COUNT("{column}")' for column in columns
+    ) + " FROM vehicles"
+    values = conn.execute(query).fetchone()
+    conn.executemany(
+        "INSERT OR REPLACE INTO column_stats (column_name, max_len, total_len, value_count) VALUES (?, ?, ?, ?)",
+        [(column, values[i * 3] or 0, int(values[i * 3 + 1]), values[i * 3 + 2]) for i, column in enumerate(columns)]
+    )
+
+# Миграции схемы vehicles. Номер миграции - ее индекс + 1, примененная версия
+# хранится в PRAGMA user_version. Шаг миграции - SQL запрос или функция,
+# получающая соединение. Новые миграции добавляются только в конец.
+MIGRATIONS = [
+    # 1: индексы для проверки дубликатов VIN и поиска по номеру регистрации
+    [
+        "CREATE INDEX IF NOT EXISTS idx_vehicles_vin ON vehicles (VIN)",
+        "CREATE INDEX IF NOT EXISTS idx_vehicles_nomer_registracii ON vehicles (NOMER_REGISTRACII)",
+    ],
+    # 2: индексы для фильтров и сортировки просмотра таблицы в SQL
+    [
+        "CREATE INDEX IF NOT EXISTS idx_vehicles_marka ON vehicles (MARKA)",
+        "CREATE INDEX IF NOT EXISTS idx_vehicles_kategoria ON vehicles (KATEGORIA)",
+        "CREATE INDEX IF NOT EXISTS idx_vehicles_god_vipuska ON vehicles (GOD_VIPUSKA)",
+        "CREATE INDEX IF NOT EXISTS idx_vehicles_in_archive ON vehicles (in_archive)",
+    ],
+    # 3: статистика длин значений и сохраненные ширины колонок просмотра таблицы
+    [
+        """CREATE TABLE IF NOT EXISTS column_stats (
+            column_name TEXT PRIMARY KEY,
+            max_len INTEGER,
+            total_len INTEGER,
+            value_count INTEGER
+        )""",
+        "CREATE TABLE IF NOT EXISTS column_widths (column_name TEXT PRIMARY KEY, width INTEGER)",
+        _fill_column_stats,
+    ],
+    # 4: правки из user_data, примененные к vehicles, но еще не подтвержденные
+    # в MySQL, и хэш их data (см. DataSync.sync_with_sqlite)
+    [
+        "CREATE TABLE IF NOT EXISTS sync_state (data_id INTEGER PRIMARY KEY, data_hash TEXT)",
+    ],
+]
+
 class Database:
-    def __init__(self):
+    def __init__(self, db_path: str = 'vehicles.db'):
         """Инициализация подключения к БД"""
-        self.db_path = 'vehicles.db'
+        self.db_path = db_path
+        # Долгоживущее соединение для вставки. Открывается при первой вставке,
+        # поэтому принадлежит потоку, который ведет загрузку
+        self._conn: Optional[sqlite3.Connection] = None
+        # Колонки таблицы vehicles и INSERT запросы по набору колонок
+        self._columns: Optional[Set[str]] = None
+        self._insert_queries: Dict[Tuple[str, ...], str] = {}
         self._ensure_db_exists()
         
     def close(self):
         """Закрытие соединения с БД"""
-        pass  # В SQLite соединения закрываются автоматически
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Возвращает долгоживущее соединение, открывая его при первом обращении"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path)
+        return self._conn
+
+    def _get_columns(self) -> Set[str]:
+        """Колонки таблицы vehicles, читаются один раз на соединение"""
+        if self._columns is None:
+            cursor = self._get_connection().execute("PRAGMA table_info(vehicles)")
+            self._columns = {row[1] for row in cursor.fetchall()}
+            print(f"[DEBUG DB] Существующие колонки: {self._columns}")
+        return self._columns
+
+    def _get_insert_query(self, columns: Tuple[str, ...]) -> str:
+        """
+        INSERT запрос для набора колонок. Строка запроса собирается один раз, а
+        sqlite3 кэширует подготовленный запрос по его тексту в рамках соединения.
+        """
+        query = self._insert_queries.get(columns)
+        if query is None:
+            query = f"INSERT INTO vehicles ({', '.join(columns)}) VALUES ({', '.join(['?' for _ in columns])})"
+            self._insert_queries[columns] = query
+        return query
         
     def _ensure_db_exists(self):
         """Проверяет существование БД и создает таблицы если нужно"""
@@ -113,92 +193,216 @@ class Database:
                         humidity REAL
                     )
                 """)
+                self._migrate(conn)
                 conn.commit()
         except Exception as e:
             print(f"[ОШИБКА] Создание БД: {e}")
             raise
 
+    def _migrate(self, conn: sqlite3.Connection):
+        """Применяет к БД миграции, которых еще нет в PRAGMA user_version"""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, statements in enumerate(MIGRATIONS[version:], version + 1):
+            print(f"[ИНФО] Миграция БД до версии {number}")
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {number}")
+
     def insert_vehicle_data(self, data: Dict[str, Any], filename: str) -> bool:
         """Вставка данных о ТС в БД"""
         try:
             print(f"\n[DEBUG DB] Попытка вставки данных для файла {filename}")
             # print(f"[DEBUG DB] Входные данные: {data}")
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Подготавливаем данные
-                prepared_data = self._prepare_data(data)
-                prepared_data['filename'] = filename
-                
-                # Добавляем данные о температуре и влажности
-                if 'temperature' in data:
-                    prepared_data['temperature'] = data['temperature']
-                if 'humidity' in data:
-                    prepared_data['humidity'] = data['humidity']
-                if 'NOMER_REGISTRACII' in data:
-                    prepared_data['NOMER_REGISTRACII'] = data['NOMER_REGISTRACII']
-                if 'DAY' in data:
-                    prepared_data['DAY'] = data['DAY']
-                if 'MONTH' in data:
-                    prepared_data['MONTH'] = data['MONTH']
-                if 'SHASSI' in data:
-                    prepared_data['SHASSI'] = data['SHASSI']
-                if 'ZAYAVITEL' in data:
-                    prepared_data['ZAYAVITEL'] = data['ZAYAVITEL']
-                if 'IZGOTOVITEL' in data:
-                    prepared_data['IZGOTOVITEL'] = data['IZGOTOVITEL']
-                if 'SBOROCHNIY_ZAVOD' in data:
-                    prepared_data['SBOROCHNIY_ZAVOD'] = data['SBOROCHNIY_ZAVOD']
-                if 'TIP_KUZOVA_DVERI' in data:
-                    prepared_data['TIP_KUZOVA_DVERI'] = data['TIP_KUZOVA_DVERI']
-                if 'RULEVOE_UPRAVLENIE' in data:
-                    prepared_data['RULEVOE_UPRAVLENIE'] = data['RULEVOE_UPRAVLENIE']
-                
-                print(f"[DEBUG DB] Подготовленные данные: {prepared_data}")
-                
-                # Проверяем VIN на дубликаты
-                if vin := prepared_data.get('VIN'):
-                    print(f"[DEBUG DB] Проверка VIN: {vin}")
-                    cursor.execute("SELECT COUNT(*) FROM vehicles WHERE VIN = ?", (vin,))
-                    if cursor.fetchone()[0] > 0:
-                        prepared_data['suspicious'] = 1
-                        cursor.execute("UPDATE vehicles SET suspicious = 1 WHERE VIN = ?", (vin,))
-                        print(f"[DEBUG DB] Найден дубликат VIN: {vin}")
-                
-                # Получаем список колонок
-                cursor.execute("PRAGMA table_info(vehicles)")
-                existing_columns = {row[1] for row in cursor.fetchall()}
-                print(f"[DEBUG DB] Существующие колонки: {existing_columns}")
-                
-                # Формируем запрос
-                columns = []
-                values = []
-                for key, value in prepared_data.items():
-                    if value is not None and key in existing_columns:
-                        columns.append(f"{key}")
-                        values.append(value)
-                
-                if not columns:
-                    print("[ОШИБКА] Нет данных для вставки")
-                    return False
-                
-                # Выполняем вставку
-                query = f"INSERT INTO vehicles ({', '.join(columns)}) VALUES ({', '.join(['?' for _ in values])})"
-                print(f"[DEBUG DB] SQL запрос: {query}")
-                print(f"[DEBUG DB] Значения: {values}")
-                
-                cursor.execute(query, values)
-                conn.commit()
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            # Подготавливаем данные
+            prepared_data = self._build_row(data, filename)
+            
+            print(f"[DEBUG DB] Подготовленные данные: {prepared_data}")
             
-                print(f"[ИНФО] Данные из файла {filename} успешно добавлены")
-                return True
+            # Проверяем VIN на дубликаты
+            if vin := prepared_data.get('VIN'):
+                print(f"[DEBUG DB] Проверка VIN: {vin}")
+                cursor.execute("SELECT 1 FROM vehicles WHERE VIN = ? LIMIT 1", (vin,))
+                if cursor.fetchone():
+                    prepared_data['suspicious'] = 1
+                    cursor.execute("UPDATE vehicles SET suspicious = 1 WHERE VIN = ?", (vin,))
+                    print(f"[DEBUG DB] Найден дубликат VIN: {vin}")
+            
+            # Формируем запрос по закэшированному списку колонок
+            existing_columns = self._get_columns()
+            columns = []
+            values = []
+            for key, value in prepared_data.items():
+                if value is not None and key in existing_columns:
+                    columns.append(key)
+                    values.append(value)
+            
+            if not columns:
+                print("[ОШИБКА] Нет данных для вставки")
+                conn.rollback()
+                return False
+            
+            # Выполняем вставку
+            query = self._get_insert_query(tuple(columns))
+            print(f"[DEBUG DB] SQL запрос: {query}")
+            print(f"[DEBUG DB] Значения: {values}")
+            
+            cursor.execute(query, values)
+            self._update_column_stats(cursor, tuple(columns), [values])
+            conn.commit()
+        
+            print(f"[ИНФО] Данные из файла {filename} успешно добавлены")
+            return True
                 
         except Exception as e:
             print(f"[ОШИБКА] Вставка данных: {e}")
             print(f"[DEBUG DB] Полная ошибка: {traceback.format_exc()}")
+            if self._conn is not None:
+                self._conn.rollback()
             return False
 
+    def insert_many(self, records: List[Tuple[Dict[str, Any], str]], batch_size: int = 500) -> List[bool]:
+        """
+        Пакетная вставка данных о ТС.
+
+        Записи вставляются через executemany, транзакция фиксируется каждые
+        batch_size записей. Ошибка в одной записи не отменяет остальные записи пачки.
+
+        Args:
+            records: Список пар (данные ТС, имя файла)
+            batch_size: Количество записей в одной транзакции
+
+        Returns:
+            List[bool]: Результат вставки для каждой записи в исходном порядке
+        """
+        results = [False] * len(records)
+        if not records:
+            return results
+
+        conn = self._get_connection()
+        for offset in range(0, len(records), batch_size):
+            chunk = records[offset:offset + batch_size]
+            try:
+                if not conn.in_transaction:
+                    conn.execute("BEGIN")
+                self._insert_chunk(conn, chunk, offset, results)
+                conn.commit()
+                print(f"[ИНФО] Пачка из {len(chunk)} записей: добавлено {sum(results[offset:offset + len(chunk)])}")
+            except Exception as e:
+                conn.rollback()
+                results[offset:offset + len(chunk)] = [False] * len(chunk)
+                print(f"[ОШИБКА] Пакетная вставка: {e}")
+                print(f"[DEBUG DB] Полная ошибка: {traceback.format_exc()}")
+        return results
+
+    def _insert_chunk(self, conn: sqlite3.Connection, chunk: List[Tuple[Dict[str, Any], str]],
+                      offset: int, results: List[bool]):
+        """Вставляет одну пачку внутри открытой транзакции, заполняя results"""
+        existing_columns = self._get_columns()
+
+        # Группируем строки по набору колонок: один executemany на группу
+        groups: Dict[Tuple[str, ...], List[Tuple[int, List[Any]]]] = {}
+        vins: Dict[int, str] = {}
+        for i, (data, filename) in enumerate(chunk, offset):
+            try:
+                row = self._build_row(data, filename)
+            except Exception as e:
+                print(f"[ОШИБКА] Подготовка данных {filename}: {e}")
+                continue
+            columns = tuple(key for key, value in row.items() if value is not None and key in existing_columns)
+            if not columns:
+                print(f"[ОШИБКА] Нет данных для вставки: {filename}")
+                continue
+            groups.setdefault(columns, []).append((i, [row[column] for column in columns]))
+            if row.get('VIN'):
+                vins[i] = row['VIN']
+
+        # VIN, которые уже были в БД до этой пачки
+        cursor = conn.cursor()
+        known_vins = set()
+        for vin in set(vins.values()):
+            cursor.execute("SELECT 1 FROM vehicles WHERE VIN = ? LIMIT 1", (vin,))
+            if cursor.fetchone():
+                known_vins.add(vin)
+
+        for columns, rows in groups.items():
+            query = self._get_insert_query(columns)
+            cursor.execute("SAVEPOINT insert_group")
+            try:
+                cursor.executemany(query, [values for _, values in rows])
+                for i, _ in rows:
+                    results[i] = True
+            except sqlite3.Error as e:
+                # Откатываем группу и вставляем по одной, чтобы найти проблемные записи
+                print(f"[ОШИБКА] Вставка группы: {e}, вставляем по одной")
+                cursor.execute("ROLLBACK TO insert_group")
+                for i, values in rows:
+                    try:
+                        cursor.execute(query, values)
+                        results[i] = True
+                    except sqlite3.Error as row_error:
+                        print(f"[ОШИБКА] Вставка {chunk[i - offset][1]}: {row_error}")
+            inserted = [values for i, values in rows if results[i]]
+            if inserted:
+                self._update_column_stats(cursor, columns, inserted)
+            cursor.execute("RELEASE insert_group")
+
+        # Помечаем дубликаты VIN: уже были в БД или повторяются в пачке
+        inserted_vins = Counter(vin for i, vin in vins.items() if results[i])
+        duplicates = [(vin,) for vin, count in inserted_vins.items() if count > 1 or vin in known_vins]
+        if duplicates:
+            cursor.executemany("UPDATE vehicles SET suspicious = 1 WHERE VIN = ?", duplicates)
+            print(f"[DEBUG DB] Найдены дубликаты VIN: {len(duplicates)}")
+
+    def _update_column_stats(self, cursor: sqlite3.Cursor, columns: Tuple[str, ...], rows: List[List[Any]]):
+        """Учитывает вставленные строки в статистике длин колонок (column_stats)"""
+        stats = []
+        for i, column in enumerate(columns):
+            lengths = [len(str(row[i])) for row in rows]
+            stats.append((max(lengths), sum(lengths), len(lengths), column))
+        # Обновляются только посчитанные колонки: строки статистики создает миграция
+        cursor.executemany(
+            "UPDATE column_stats SET max_len = MAX(max_len, ?), total_len = total_len + ?, "
+            "value_count = value_count + ? WHERE column_name = ?",
+            stats
+        )
+
+    def _build_row(self, data: Dict[str, Any], filename: str) -> Dict[str, Any]:
+        """Строка таблицы vehicles из распарсенных данных ТС"""
+        prepared_data = self._prepare_data(data)
+        prepared_data['filename'] = filename
+        
+        # Добавляем данные о температуре и влажности
+        if 'temperature' in data:
+            prepared_data['temperature'] = data['temperature']
+        if 'humidity' in data:
+            prepared_data['humidity'] = data['humidity']
+        if 'NOMER_REGISTRACII' in data:
+            prepared_data['NOMER_REGISTRACII'] = data['NOMER_REGISTRACII']
+        if 'DAY' in data:
+            prepared_data['DAY'] = data['DAY']
+        if 'MONTH' in data:
+            prepared_data['MONTH'] = data['MONTH']
+        if 'SHASSI' in data:
+            prepared_data['SHASSI'] = data['SHASSI']
+        if 'ZAYAVITEL' in data:
+            prepared_data['ZAYAVITEL'] = data['ZAYAVITEL']
+        if 'IZGOTOVITEL' in data:
+            prepared_data['IZGOTOVITEL'] = data['IZGOTOVITEL']
+        if 'SBOROCHNIY_ZAVOD' in data:
+            prepared_data['SBOROCHNIY_ZAVOD'] = data['SBOROCHNIY_ZAVOD']
+        if 'TIP_KUZOVA_DVERI' in data:
+            prepared_data['TIP_KUZOVA_DVERI'] = data['TIP_KUZOVA_DVERI']
+        if 'RULEVOE_UPRAVLENIE' in data:
+            prepared_data['RULEVOE_UPRAVLENIE'] = data['RULEVOE_UPRAVLENIE']
+        return prepared_data
+
     def _prepare_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Подготовка данных для вставки"""
         prepared = {}
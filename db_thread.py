@@ -1,10 +1,23 @@
 from PyQt6.QtCore import QThread, pyqtSignal
 from sql_to_myaql import DataSync
+import sqlite3
 import traceback
 
+# Подключение к серверу MySQL. Соединения по этой конфигурации берутся из
+# общего пула (sql_to_myaql.get_pool), поэтому все потоки переиспользуют их
+MYSQL_CONFIG = {
+    'host': '91.209.226.31',
+    'user': 'USER', 
+    'password': 'password',
+    'database': 'Centramash',
+    'connection_timeout': 10,  # Добавляем таймаут подключения
+    'use_pure': True  # Используем чистый Python для подключения
+}
+
 class DBWorker(QThread):
     finished = pyqtSignal(bool, str)
     users_loaded = pyqtSignal(list)
+    progress = pyqtSignal(int, int)  # Отправлено строк, всего строк
     
     def __init__(self, selected_data=None, user_id=None):
         super().__init__()
@@ -16,14 +29,7 @@ class DBWorker(QThread):
         try:
             # Создаем экземпляр DataSync только при первом запуске
             if not self.sync:
-                self.sync = DataSync({
-                    'host': '91.209.226.31',
-                    'user': 'USER', 
-                    'password': 'password',
-                    'database': 'Centramash',
-                    'connection_timeout': 10,  # Добавляем таймаут подключения
-                    'use_pure': True  # Используем чистый Python для подключения
-                }, 'vehicles.db')
+                self.sync = DataSync(MYSQL_CONFIG, 'vehicles.db')
             
             if not self.selected_data:
                 # Загружаем список пользователей
@@ -39,7 +45,8 @@ class DBWorker(QThread):
                     self.finished.emit(False, "Не указан ID пользователя")
                     return
                     
-                success = self.sync.send_to_mysql(self.selected_data, self.user_id)
+                success = self.sync.send_to_mysql(self.selected_data, self.user_id,
+                                                  progress=self.progress.emit)
                 self.finished.emit(success, 
                     "Данные успешно отправлены" if success else "Не удалось отправить данные")
                 
@@ -49,6 +56,7 @@ class DBWorker(QThread):
 
 class SyncWorker(QThread):
     finished = pyqtSignal(bool, str)
+    values_changed = pyqtSignal(object)  # Колонка -> значение -> изменение количества строк
     
     def __init__(self, mysql_config=None, sqlite_db=None):
         super().__init__()
@@ -60,16 +68,11 @@ class SyncWorker(QThread):
         try:
             # Создаем экземпляр DataSync только при первом запуске
             if not self.sync:
-                self.sync = DataSync({
-                    'host': '91.209.226.31',
-                    'user': 'USER',
-                    'password': 'password', 
-                    'database': 'Centramash',
-                    'connection_timeout': 10,  # Добавляем таймаут подключения
-                    'use_pure': True  # Используем чистый Python для подключения
-                }, 'vehicles.db')
+                self.sync = DataSync(self.mysql_config or MYSQL_CONFIG, self.sqlite_db or 'vehicles.db')
             
             success = self.sync.sync_with_sqlite()
+            # Примененные изменения, даже если синхронизация прервалась
+            self.values_changed.emit(self.sync.value_deltas)
             print(f"Успешно синхронизировано {success} записей")
             self.finished.emit(success,
                 "Синхронизация выполнена успешно" if success else "Ошибка при синхронизации")
@@ -77,3 +80,36 @@ class SyncWorker(QThread):
         except Exception as e:
             error_msg = f"Ошибка синхронизации: {str(e)}\n{traceback.format_exc()}"
             self.finished.emit(False, error_msg)
+
+class LoadWorker(QThread):
+    """Читает таблицу vehicles в фоне и отдает строки пачками"""
+    rows_loaded = pyqtSignal(list)
+    finished = pyqtSignal(bool, str)
+    
+    def __init__(self, db_path='vehicles.db', first_batch=200, batch_size=5000):
+        super().__init__()
+        self.db_path = db_path
+        # Первая пачка маленькая, чтобы первый экран таблицы появился сразу
+        self.first_batch = first_batch
+        self.batch_size = batch_size
+        
+    def run(self):
+        conn = None
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.execute("SELECT * FROM vehicles")
+            size = self.first_batch
+            while not self.isInterruptionRequested():
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    break
+                self.rows_loaded.emit([list(row) for row in rows])
+                size = self.batch_size
+            self.finished.emit(True, "")
+            
+        except Exception as e:
+            error_msg = f"Ошибка загрузки данных: {str(e)}\n{traceback.format_exc()}"
+            self.finished.emit(False, error_msg)
+        finally:
+            if conn:
+                conn.close()
@@ -1,6 +1,7 @@
 import sys
 import os
 import math
+import multiprocessing
 from PyQt6 import QtWidgets, QtCore, QtGui
 from PyQt6.QtCore import Qt, QPropertyAnimation, QEasingCurve, QPoint, QRectF, QPointF, QThread, pyqtSignal
 from PyQt6.QtGui import QPainter, QColor, QPen, QFont, QPainterPath, QBrush
@@ -1181,7 +1182,8 @@ class MainWindow(QtWidgets.QMainWindow):
                 excel_path=self.excel1_path,  # Excel с погодой
                 sheet_name=None,  # Лист по умолчанию
                 sbkts_excel_path=self.excel2_path,  # Excel с СБКТС
-                sbkts_sheet_name=self.sheet2_input.text()  # Название листа из поля ввода
+                sbkts_sheet_name=self.sheet2_input.text(),  # Название листа из поля ввода
+                workers=max(1, (os.cpu_count() or 1) - 1)  # Один процессор оставляем интерфейсу и записи в БД
             )
             
             # Подключаем сигналы
@@ -1438,6 +1440,8 @@ class DatabaseThread(QThread):
             self.finished.emit()
 
 if __name__ == '__main__':
+    # Нужно для пула процессов парсинга в собранном exe
+    multiprocessing.freeze_support()
     app = QtWidgets.QApplication(sys.argv)
     window = MainWindow()
     window.show()
@@ -2,12 +2,251 @@ from PyPDF2 import PdfReader
 import re
 from datetime import datetime
 from utils import read_excel_data, get_sbkts_data
+from text_cache import TextCache
+import hashlib
 import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, Iterator, Optional, Tuple
 from copy import deepcopy
 
+# Флаги, с которыми ищутся все поля сертификата
+PATTERN_FLAGS = re.IGNORECASE | re.DOTALL
+
+# Словарь для преобразования месяцев
+MONTH_MAP = {
+    'января': '01', 'февраля': '02', 'марта': '03', 'апреля': '04',
+    'мая': '05', 'июня': '06', 'июля': '07', 'августа': '08',
+    'сентября': '09', 'октября': '10', 'ноября': '11', 'декабря': '12'
+}
+
+# Общий словарь паттернов для всех типов ТС (исходные строки)
+PATTERN_SOURCES = {
+    'MARKA': r'МАРКА\s+(.+?)(?=\n|КОММЕРЧЕСКОЕ)',
+    'KOMMERCHESKOE_NAIMENOVANIE': r'КОММЕРЧЕСКОЕ\s+НАИМЕНОВАНИЕ\s*(.+?)(?=\n|ТИП)',
+    'TIP': r'ТИП\s+(.+?)(?=\n|ШАССИ)',
+    'SHASSI': r'ШАССИ\s+(.+?)(?=\n|ИДЕНТИФИКАЦИОН)',
+    'VIN': r'ИДЕНТИФИКАЦИОН\s*НЫЙ\s+НОМЕР\s+\(VIN\)\s*(.+?)(?=\n|ГОД)',
+    'GOD_VIPUSKA': r'ГОД\s+ВЫПУСКА\s+(.+?)(?=\n|КАТЕГОРИЯ)',
+    'KATEGORIA': r'КАТЕГОРИЯ\s+(.+?)(?=\n|ЭКОЛОГИЧЕСКИЙ)',
+    'EKOLOGICHESKIY_KLASS': r'ЭКОЛОГИЧЕСКИЙ\s+КЛАСС\s*(.+?)(?=\n|ЗАЯВИТЕЛЬ)',
+    'ZAYAVITEL': r'ЗАЯВИТЕЛЬ\s+И\s+ЕГО\s+АДРЕС\s*(.+?)(?=ТРАНСПОРТНОЕ\s+СРЕДСТВО|ИЗГОТОВИТЕЛЬ)',
+    'IZGOTOVITEL': r'ИЗГОТОВИТЕЛЬ\s+И\s+ЕГО\s+АДРЕС\s*(.+?)(?=СБОРОЧНЫЙ\s+ЗАВОД|ТРАНСПОРТНОЕ\s+СРЕДСТВО)',
+    'SBOROCHNIY_ZAVOD': r'СБОРОЧНЫЙ\s+ЗАВОД\s+И\s+ЕГО\s+АДРЕС\s*(.+?)(?=Колесная|ТРАНСПОРТНОЕ\s+СРЕДСТВО)',
+    'KOLESNAYA_FORMULA': r'Колесная\s+формула/ведущие\s+колеса\s*(.+?)(?=\n|Схема)',
+    'SHEMA_KOMPONOVKI': r'Схема\s+компоновки\s+транспортного\s+средства\s*(.+?)(?=\n|Тип)',
+    'TIP_KUZOVA': r'Тип\s+кузова/количество\s+дверей\s*(.+?)(?=\n|Количество)',
+    'MESTA': r'Количество\s+мест\s+спереди/сзади\s*(.+?)(?=\n|Масса)',
+    'MASSA_SNARYAZHENNAYA': r'Масса\s+транспортного\s+средства\s+в\s+снаряженном\s+состоянии,\s+кг\s*(\d+)',
+    'MASSA_MAKSIMALNAYA': r'Технически\s+допустимая\s+максимальная\s+масса\s+транспортного\s+средства,\s+кг\s*(\d+)',
+    'GABARITY': r'Габаритные\s+размеры,\s+мм\s*\n-\s*длина\s+(\d+)\s*\n-\s*ширина\s+(\d+)\s*\n-\s*высота\s+(\d+)',
+    'BAZA': r'База,\s+мм\s+(\d+)',
+    'KOLEYA': r'Колея\s+передних/задних\s+колес,\s+мм\s*(.+?)(?=\n|Двигатель)',
+    'DVIGATEL_MODEL': r'Двигатель\s+внутреннего\s+сгорания\s+\(марка,\s+тип\)\s*([^\n]+(?:\n[^\n]+)*?)(?=\n\s*-\s*количество|ОБЩИЕ)',
+    'DVIGATEL_CYLINDRY': r'количество\s+и\s+расположение\s+цилиндров\s*(.+?)(?=\n|-\s*рабочий)',
+    'DVIGATEL_OBEM': r'рабочий\s+объем\s+цилиндров,\s+см³\s*(\d+)',
+    'DVIGATEL_SZHATIYE': r'степень\s+сжатия\s+(.+?)(?=\n|-\s*максимальная)',
+    'DVIGATEL_MOSHNOST': r'максимальная\s+мощность,\s+кВт\s+\(мин-1\)\s*(.+?)(?=\n|Топливо)',
+    'TOPLIVO_TIP': r'Топливо\s+(.+?)(?=\n|Система)',
+    'TOPLIVO_SISTEMA_PITANIYA': r'Система\s+питания\s+\(тип\)\s+(.+?)(?=\n|Система\s+выпуска)',
+    'TOPLIVO_SISTEMA_VIPUSKA': r'Система\s+выпуска\s+и\s+нейтрализации\s+отработавших\s+газов\s*([^\n]+(?:\n[^\n]+)*?)(?=\n\s*Трансмиссия)',
+    'TRANSMISSIYA_TIP': r'Трансмиссия\s+(.+?)(?=\n|Сцепление)',
+    'TRANSMISSIYA_SCEPLENIE': r'Сцепление\s+\(марка,\s+тип\)\s+(.+?)(?=\n|Коробка)',
+    'TRANSMISSIYA_KOROBKA': r'Коробка\s+передач\s+\(марка,\s+тип\)\s*(.+?)(?=\n|Подвеска)',
+    'PODVESKA_PEREDNYAYA': r'Подвеска\s*\(тип\)\s*\n\s*Передняя\s+([^\n]+(?:\n[^\n]+)*?)(?=\n\s*Задняя)',
+    'PODVESKA_ZADNYAYA': r'Задняя\s+([^\n]+(?:\n[^\n]+)*?)(?=\n\s*Рулевое)',
+    'RULEVOE_UPRAVLENIE': r'Рулевое\s+управление\s*(?:\(марка,\s*тип\))?\s*([^\n]+(?:\n[^\n]+)*?)(?=\n\s*Тормозные)',
+    # 'RULEVOE_UPRAVLENIE': r'Рулевое\s+управление\s+\(марка,\s+тип\)\s*(.+?)(?=\n|Тормозные)',
+    'TORMOZNAYA_RABOCHAYA': r'-\s*рабочая\s+([^\n]+(?:\n[^\n]+)*?)(?=\n\s*-\s*запасная)',
+    'TORMOZNAYA_ZAPASNAYA': r'-\s*запасная\s+([^\n]+(?:\n[^\n]+)*?)(?=\n\s*-\s*стояночная)',
+    'TORMOZNAYA_STOYANOCHNAYA': r'-\s*стояночная\s+([^\n]+(?:\n[^\n]+)*?)(?=\n\s*(?:-\s*вспомогательная|Шины))',
+    'TORMOZNAYA_VSPOMOGATELNAYA': r'-\s*вспомогательная\s*\(?износостойкая\)?\s*([^\n]+(?:\n[^\n]+)*?)(?=\n\s*Шины)',
+    'SHINY': r'Шины\s+(.+?)(?=\n|Оборудование)',
+    'OBORUDOVANIE': r'Оборудование\s+транспортного\s+средства\s*(.+?)(?=соответствуют|номер\s+УВЭОС)',
+    'UVEOS': r'номер\s+УВЭОС\s+(\d+)',
+    'BAZOVOE_VIN': r'Идентификационный\s+номер\s+шасси\s+([A-Z0-9]+)',
+    'BAZOVOE_MODIFIKACIYA': r'модификации\s+(\d+)',
+    'DATA_OFORMLENIYA': r'Дата\s+оформления\s+"(\d{2})"\s+([а-я]+)\s+(\d{4})',
+    'TIP_KUZOVA_DVERI': r'(?:Тип\s+кузова\s*/\s*количество\s+дверей|Тип\s+кузова[^\n]*?/[^\n]*?двер(?:ей|и))\s*([^\n]+?)(?=\s*Количество|$)',
+    'NOMER_REGISTRACII': r'№\s*ТС\s*([A-Z]{2}\s*[А-Я]-[A-Z]{2}\.\d+\.\d+)',
+}
+
+# Специфические поля для разных категорий
+CATEGORY_FIELD_SOURCES = {
+    'M1': {
+        'PASSAZHIROVMESTIMOST': r'Пассажировместимость\s*[:-]?\s*(\d+)',
+        'OBEM_BAGAZHNIKA': r'Объем\s+багажника,\s*л\s*(\d+)',
+        'PODUSHKI_BEZOPASNOSTI': r'Подушки\s+безопасности\s+([^\n]+)',
+        'KLIMAT_USTANOVKA': r'Климатическая\s+установка\s+([^\n]+)',
+        'TIP_KUZOVA_DVERI': r'(?:Тип\s+кузова\s*/\s*количество\s+дверей|Тип\s+кузова[^\n]*?/[^\n]*?двер(?:ей|и))\s*([^\n]+?)(?=\s*Количество|$)',
+        'MESTA_SPEREDI_SZADI': r'(?:Количество\s+мест\s+спереди\s*/\s*сзади|Количество\s+мест[^\n]*?спереди[^\n]*?сзади)\s*(\d+\s*/\s*\d+)',
+        'SHEMA_KOMPONOVKI': r'(?:(?:Схема\s*компоновки\s*транспортного\s*средства|(?:капотная|вагонная|полукапотная|кабина\s+над\s+двигателем|переднеприводная))\s*(.*?))(?=\s*(?:Исполнение|Тип|$))'
+    },
+    'M3': {
+        'PASSAZHIROVMESTIMOST': r'Пассажировместимость\s*[:-]?\s*(\d+)',
+        'MESTA_DLYA_STOYANIYA': r'Места\s+для\s+стояния\s*[:-]?\s*(\d+)',
+        'AVARIYNIE_VYHODY': r'Аварийные\s+выходы\s+([^\n]+)',
+        'MARSHRUTOUKAZATELI': r'Маршрутоуказатели\s+([^\n]+)',
+        'SHEMA_KOMPONOVKI': r'Схема\s+компоновки\s+([^\n]+)'
+    },
+    'N2': {
+        'GRUZOPODYEMNOST': r'Грузоподъемность,\s*кг\s*(\d+)',
+        'OBEM_GRUZOVOGO_OTSEKA': r'Объем\s+грузового\s+отсека,\s*м³\s*(\d+(?:\.\d+)?)',
+        'POGRUZOCHNAYA_VYSOTA': r'Погрузочная\s+высота,\s*мм\s*(\d+)',
+        'SHEMA_KOMPONOVKI': r'Схема\s+компоновки\s+([^\n]+)'
+    },
+    'N3': {
+        'GRUZOPODYEMNOST': r'Грузоподъемность,\s*кг\s*(\d+)',
+        'NAGRUZKA_SSU': r'Нагрузка\s+на\s+седельно-сцепное\s+устройство,\s*кг\s*(\d+)',
+        'MASSA_PRICEPA': r'Масса\s+буксируемого\s+прицепа,\s*кг\s*(\d+)',
+        'SHEMA_KOMPONOVKI': r'Схема\s+компоновки\s+([^\n]+)'
+    },
+    'O4': {
+        'GRUZOPODYEMNOST': r'Грузоподъемность,\s*кг\s*(\d+)',
+        'KOLICHESTVO_OSEY': r'Количество\s+осей\s*[:-]?\s*(\d+)',
+        'NAGRUZKA_SHKVORNYA': r'Нагрузка\s+на\s+шкворень,\s*кг\s*(\d+)',
+        'SHEMA_KOMPONOVKI': r'Схема\s+компоновки\s+([^\n]+)'
+    }
+}
+
+# Скомпилированные паттерны. Собираются один раз при импорте и общие для всех экземпляров PDFParser
+PATTERNS = {key: re.compile(pattern, PATTERN_FLAGS) for key, pattern in PATTERN_SOURCES.items()}
+CATEGORY_FIELDS = {
+    category: {key: re.compile(pattern, PATTERN_FLAGS) for key, pattern in fields.items()}
+    for category, fields in CATEGORY_FIELD_SOURCES.items()
+}
+
+# Служебные фразы колонтитулов, которые вырезаются из текста PDF
+_CLEANUP_RE = re.compile(r'(?:ОБЩИЕ ХАРАКТЕРИСТИКИ ТРАНСПОРТНОГО СРЕДСТВАМ\.П\.Стр\.\d|ТРАНСПОРТНОЕ СРЕДСТВОМ\.П\.Стр\.\d|М\.П\.Стр\.\d)\s*ТС\s*BY\s*А-BY\.\d+\.\d+Свидетельство\s*о\s*безопасности\s*конструкции\s*транспортного\s*средства\s*№')
+# Колонтитул разрывается между страницами: "...М.П.Стр.N" внизу страницы и
+# "ТС BY ... №" вверху следующей. Хвост страницы, в котором может начинаться
+# колонтитул (маркер и самый длинный текст перед ним), переносится к следующей
+_FOOTER_MARKER = 'М.П.Стр.'
+_FOOTER_PREFIX_LEN = len('ОБЩИЕ ХАРАКТЕРИСТИКИ ТРАНСПОРТНОГО СРЕДСТВА')
+_WHITESPACE_RE = re.compile(r'\s+')
+# Версия очистки текста для кэша извлеченного текста: меняется вместе с
+# паттерном колонтитулов, и тексты, очищенные старой версией, сбрасываются
+TEXT_VERSION = hashlib.sha256((_CLEANUP_RE.pattern + _FOOTER_MARKER).encode('utf-8')).hexdigest()[:16]
+# Сколько символов конца уже извлеченного текста повторно просматривать при
+# поиске даты оформления на новой странице
+_DATE_SEARCH_OVERLAP = 200
+# Рег. номер СБКТС внутри ячейки листа (как группа в паттерне NOMER_REGISTRACII)
+_REG_NUMBER_RE = re.compile(r'[A-Z]{2}\s*[А-Я]-[A-Z]{2}\.\d+\.\d+', re.IGNORECASE)
+
+
+def _normalize_reg_number(value: str) -> str:
+    """Ключ рег. номера СБКТС: без пробелов и в верхнем регистре"""
+    return _WHITESPACE_RE.sub('', value).upper()
+
+
+def clean_pages(pages: Iterable[str]) -> Iterator[str]:
+    """
+    Вырезает колонтитулы из текстов страниц по мере их поступления.
+
+    Склеенный результат совпадает с очисткой _CLEANUP_RE всего текста целиком,
+    но страницы не нужно извлекать заранее.
+    """
+    carry = ''
+    for page in pages:
+        buffer = carry + page
+        cut = max(0, len(buffer) - _FOOTER_PREFIX_LEN - len(_FOOTER_MARKER))
+        marker = buffer.rfind(_FOOTER_MARKER)
+        if marker != -1:
+            cut = min(cut, max(0, marker - _FOOTER_PREFIX_LEN))
+        for match in _CLEANUP_RE.finditer(buffer):
+            if match.end() <= cut:
+                continue
+            if match.start() < cut:
+                # Не режем внутри целого колонтитула
+                cut = match.end()
+            break
+        carry = buffer[cut:]
+        if cut:
+            yield _CLEANUP_RE.sub('', buffer[:cut])
+    if carry:
+        yield _CLEANUP_RE.sub('', carry)
+
+# Разделы сертификата: название -> паттерн заголовка раздела
+SECTION_LABELS = {
+    'МАРКА': r'МАРКА',
+    'ЗАЯВИТЕЛЬ И ЕГО АДРЕС': r'ЗАЯВИТЕЛЬ\s+И\s+ЕГО\s+АДРЕС',
+    'ИЗГОТОВИТЕЛЬ И ЕГО АДРЕС': r'ИЗГОТОВИТЕЛЬ\s+И\s+ЕГО\s+АДРЕС',
+    'СБОРОЧНЫЙ ЗАВОД И ЕГО АДРЕС': r'СБОРОЧНЫЙ\s+ЗАВОД\s+И\s+ЕГО\s+АДРЕС',
+    'Колесная формула': r'Колесная\s+формула',
+    'Двигатель внутреннего сгорания': r'Двигатель\s+внутреннего\s+сгорания',
+    'Топливо': r'Топливо',
+    'Трансмиссия': r'Трансмиссия',
+    'Подвеска': r'Подвеска',
+    'Рулевое управление': r'Рулевое\s+управление',
+    'Тормозные системы': r'Тормозные\s+системы',
+    'Шины': r'Шины',
+    'Дата оформления': r'Дата\s+оформления',
+}
+
+# Раздел, в котором ищется каждое поле. Поля без раздела ищутся по всему тексту
+SECTION_FIELDS = {
+    **dict.fromkeys(['MARKA', 'KOMMERCHESKOE_NAIMENOVANIE', 'TIP', 'SHASSI', 'VIN',
+                     'GOD_VIPUSKA', 'KATEGORIA', 'EKOLOGICHESKIY_KLASS'], 'МАРКА'),
+    'ZAYAVITEL': 'ЗАЯВИТЕЛЬ И ЕГО АДРЕС',
+    'IZGOTOVITEL': 'ИЗГОТОВИТЕЛЬ И ЕГО АДРЕС',
+    'SBOROCHNIY_ZAVOD': 'СБОРОЧНЫЙ ЗАВОД И ЕГО АДРЕС',
+    **dict.fromkeys(['KOLESNAYA_FORMULA', 'SHEMA_KOMPONOVKI', 'TIP_KUZOVA', 'MESTA',
+                     'MASSA_SNARYAZHENNAYA', 'MASSA_MAKSIMALNAYA', 'GABARITY', 'BAZA',
+                     'KOLEYA'], 'Колесная формула'),
+    **dict.fromkeys(['DVIGATEL_MODEL', 'DVIGATEL_CYLINDRY', 'DVIGATEL_OBEM',
+                     'DVIGATEL_SZHATIYE', 'DVIGATEL_MOSHNOST'], 'Двигатель внутреннего сгорания'),
+    **dict.fromkeys(['TOPLIVO_TIP', 'TOPLIVO_SISTEMA_PITANIYA', 'TOPLIVO_SISTEMA_VIPUSKA'], 'Топливо'),
+    **dict.fromkeys(['TRANSMISSIYA_TIP', 'TRANSMISSIYA_SCEPLENIE', 'TRANSMISSIYA_KOROBKA'], 'Трансмиссия'),
+    **dict.fromkeys(['PODVESKA_PEREDNYAYA', 'PODVESKA_ZADNYAYA'], 'Подвеска'),
+    'RULEVOE_UPRAVLENIE': 'Рулевое управление',
+    **dict.fromkeys(['TORMOZNAYA_RABOCHAYA', 'TORMOZNAYA_ZAPASNAYA', 'TORMOZNAYA_STOYANOCHNAYA',
+                     'TORMOZNAYA_VSPOMOGATELNAYA'], 'Тормозные системы'),
+    **dict.fromkeys(['SHINY', 'OBORUDOVANIE', 'UVEOS'], 'Шины'),
+    'DATA_OFORMLENIYA': 'Дата оформления',
+}
+
+# Заголовки ищутся с учетом регистра: опережающая проверка первой буквы позволяет
+# re пропускать неподходящие позиции без перебора всех альтернатив. Если заголовок
+# написан иначе, раздел не будет найден и его поля ищутся по всему тексту
+_SECTION_NAMES = list(SECTION_LABELS)
+_SECTION_RE = re.compile(
+    '(?=[' + ''.join(sorted({label[0] for label in SECTION_LABELS.values()})) + '])(?:'
+    + '|'.join(f'(?P<s{i}>{label})' for i, label in enumerate(SECTION_LABELS.values()))
+    + ')'
+)
+
+
+def split_sections(text: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Делит текст сертификата на разделы за один проход по тексту.
+
+    Началом раздела считается первое вхождение его заголовка. Граница раздела
+    включает заголовок следующего раздела, так как на него ссылаются lookahead
+    паттернов полей (например, МАРКА ... (?=КОММЕРЧЕСКОЕ)).
+
+    Returns:
+        Dict[str, Tuple[int, int]]: Название раздела -> (начало, конец) в тексте
+    """
+    headers = []  # (начало, конец заголовка, название) в порядке следования
+    seen = set()
+    for match in _SECTION_RE.finditer(text):
+        name = _SECTION_NAMES[match.lastindex - 1]
+        if name not in seen:
+            seen.add(name)
+            headers.append((match.start(), match.end(), name))
+            if len(seen) == len(_SECTION_NAMES):
+                break
+
+    sections = {}
+    for i, (start, _, name) in enumerate(headers):
+        end = headers[i + 1][1] if i + 1 < len(headers) else len(text)
+        sections[name] = (start, end)
+    return sections
+
+
 class PDFParser:
     _sbkts_df = None  # Статический DataFrame для всех экземпляров класса
+    _sbkts_index: Dict[str, int] = {}  # Нормализованный рег. номер -> позиция строки в _sbkts_df
+    _sbkts_reg_column = None  # Колонка с рег. номером СБКТС
+    _sbkts_columns: Dict[str, str] = {}  # Поле SBKTS -> колонка листа
     
     @classmethod
     def load_sbkts_data(cls, excel_path: str, sheet_name: str = None):
@@ -15,13 +254,81 @@ class PDFParser:
         if cls._sbkts_df is None:
             cls._sbkts_df = get_sbkts_data(excel_path, sheet_name)
             print(f"[DEBUG PARSER] СБКТС данные загружены, строк: {len(cls._sbkts_df) if cls._sbkts_df is not None else 0}")
+            cls._build_sbkts_index()
+
+    @classmethod
+    def _build_sbkts_index(cls):
+        """Один раз определяет колонки листа СБКТС и строит индекс по рег. номеру"""
+        cls._sbkts_index = {}
+        cls._sbkts_reg_column = None
+        cls._sbkts_columns = {}
+        if cls._sbkts_df is None:
+            return
+
+        for col in cls._sbkts_df.columns:
+            col_lower = col.lower()
+            if cls._sbkts_reg_column is None and 'регистрационный' in col_lower and 'номер' in col_lower and 'сбктс' in col_lower:
+                cls._sbkts_reg_column = col
+            elif '№' in col and 'п/п' in col:
+                cls._sbkts_columns['nomer'] = col
+            elif 'дата' in col_lower and 'заяв' in col_lower:
+                cls._sbkts_columns['data_zayavki'] = col
+            elif 'инженер' in col_lower:
+                cls._sbkts_columns['inzhener'] = col
+
+        if cls._sbkts_reg_column is None:
+            print("[DEBUG PARSER] Не найдена колонка с рег. номером СБКТС, индекс не построен")
+            return
+
+        # Ячейка индексируется целиком и по каждому найденному в ней рег. номеру.
+        # При повторах остается первая строка, как при поиске по маске
+        for pos, value in enumerate(cls._sbkts_df[cls._sbkts_reg_column]):
+            if value is None or value != value:  # None или NaN
+                continue
+            value = str(value)
+            cls._sbkts_index.setdefault(_normalize_reg_number(value), pos)
+            for number in _REG_NUMBER_RE.findall(value):
+                cls._sbkts_index.setdefault(_normalize_reg_number(number), pos)
+        print(f"[DEBUG PARSER] Индекс СБКТС построен, ключей: {len(cls._sbkts_index)}")
+
+    @classmethod
+    def find_sbkts_row(cls, reg_number: str, substring_fallback: bool = False):
+        """
+        Ищет строку листа СБКТС по рег. номеру.
+
+        Args:
+            reg_number: Рег. номер из сертификата
+            substring_fallback: Если точного совпадения нет, искать номер как подстроку
+                по всей колонке (полный проход по листу). Индекс уже содержит номера,
+                найденные внутри ячеек, поэтому по умолчанию выключено
+
+        Returns:
+            Строка листа (pandas.Series) или None
+        """
+        if cls._sbkts_df is None or cls._sbkts_reg_column is None:
+            return None
+
+        pos = cls._sbkts_index.get(_normalize_reg_number(reg_number))
+        if pos is not None:
+            return cls._sbkts_df.iloc[pos]
+
+        if not substring_fallback:
+            return None
+
+        mask = cls._sbkts_df[cls._sbkts_reg_column].astype(str).str.contains(reg_number, na=False, case=False, regex=False)
+        matching_row = cls._sbkts_df[mask]
+        return None if matching_row.empty else matching_row.iloc[0]
     
-    def __init__(self, excel_path: str = None, sheet_name: str = None, sbkts_excel_path: str = None, sbkts_sheet_name: str = None):
+    def __init__(self, excel_path: str = None, sheet_name: str = None, sbkts_excel_path: str = None, sbkts_sheet_name: str = None,
+                 text_cache_path: str = None):
         print(f"\n[DEBUG PARSER] Инициализация PDFParser:")
         print(f"[DEBUG PARSER] Excel файл с погодой: {excel_path}")
         print(f"[DEBUG PARSER] Excel файл СБКТС: {sbkts_excel_path}")
         print(f"[DEBUG PARSER] Лист СБКТС: {sbkts_sheet_name}")
-        self.df_climate_date = read_excel_data(excel_path, sheet_name) if excel_path != None else None
+        print(f"[DEBUG PARSER] Кэш текста PDF: {text_cache_path}")
+        # Кэш извлеченного текста (None - извлекать каждый раз заново)
+        self.text_cache = TextCache(text_cache_path, version=TEXT_VERSION) if text_cache_path else None
+        self.set_climate_data(read_excel_data(excel_path, sheet_name) if excel_path != None else None)
         
         # Загружаем СБКТС данные, если они еще не загружены
         if sbkts_excel_path and self._sbkts_df is None:
@@ -127,102 +434,43 @@ class PDFParser:
         self.sbkts_excel_path = sbkts_excel_path
         self.sbkts_sheet_name = sbkts_sheet_name
         
-        # Словарь для преобразования месяцев
-        self.month_map = {
-            'января': '01', 'февраля': '02', 'марта': '03', 'апреля': '04',
-            'мая': '05', 'июня': '06', 'июля': '07', 'августа': '08',
-            'сентября': '09', 'октября': '10', 'ноября': '11', 'декабря': '12'
-        }
-        
-        # Общий словарь паттернов для всех типов ТС
-        self.patterns = {
-            'MARKA': r'МАРКА\s+(.+?)(?=\n|КОММЕРЧЕСКОЕ)',
-            'KOMMERCHESKOE_NAIMENOVANIE': r'КОММЕРЧЕСКОЕ\s+НАИМЕНОВАНИЕ\s*(.+?)(?=\n|ТИП)',
-            'TIP': r'ТИП\s+(.+?)(?=\n|ШАССИ)',
-            'SHASSI': r'ШАССИ\s+(.+?)(?=\n|ИДЕНТИФИКАЦИОН)',
-            'VIN': r'ИДЕНТИФИКАЦИОН\s*НЫЙ\s+НОМЕР\s+\(VIN\)\s*(.+?)(?=\n|ГОД)',
-            'GOD_VIPUSKA': r'ГОД\s+ВЫПУСКА\s+(.+?)(?=\n|КАТЕГОРИЯ)',
-            'KATEGORIA': r'КАТЕГОРИЯ\s+(.+?)(?=\n|ЭКОЛОГИЧЕСКИЙ)',
-            'EKOLOGICHESKIY_KLASS': r'ЭКОЛОГИЧЕСКИЙ\s+КЛАСС\s*(.+?)(?=\n|ЗАЯВИТЕЛЬ)',
-            'ZAYAVITEL': r'ЗАЯВИТЕЛЬ\s+И\s+ЕГО\s+АДРЕС\s*(.+?)(?=ТРАНСПОРТНОЕ\s+СРЕДСТВО|ИЗГОТОВИТЕЛЬ)',
-            'IZGOTOVITEL': r'ИЗГОТОВИТЕЛЬ\s+И\s+ЕГО\s+АДРЕС\s*(.+?)(?=СБОРОЧНЫЙ\s+ЗАВОД|ТРАНСПОРТНОЕ\s+СРЕДСТВО)',
-            'SBOROCHNIY_ZAVOD': r'СБОРОЧНЫЙ\s+ЗАВОД\s+И\s+ЕГО\s+АДРЕС\s*(.+?)(?=Колесная|ТРАНСПОРТНОЕ\s+СРЕДСТВО)',
-            'KOLESNAYA_FORMULA': r'Колесная\s+формула/ведущие\s+колеса\s*(.+?)(?=\n|Схема)',
-            'SHEMA_KOMPONOVKI': r'Схема\s+компоновки\s+транспортного\s+средства\s*(.+?)(?=\n|Тип)',
-            'TIP_KUZOVA': r'Тип\s+кузова/количество\s+дверей\s*(.+?)(?=\n|Количество)',
-            'MESTA': r'Количество\s+мест\s+спереди/сзади\s*(.+?)(?=\n|Масса)',
-            'MASSA_SNARYAZHENNAYA': r'Масса\s+транспортного\s+средства\s+в\s+снаряженном\s+состоянии,\s+кг\s*(\d+)',
-            'MASSA_MAKSIMALNAYA': r'Технически\s+допустимая\s+максимальная\s+масса\s+транспортного\s+средства,\s+кг\s*(\d+)',
-            'GABARITY': r'Габаритные\s+размеры,\s+мм\s*\n-\s*длина\s+(\d+)\s*\n-\s*ширина\s+(\d+)\s*\n-\s*высота\s+(\d+)',
-            'BAZA': r'База,\s+мм\s+(\d+)',
-            'KOLEYA': r'Колея\s+передних/задних\s+колес,\s+мм\s*(.+?)(?=\n|Двигатель)',
-            'DVIGATEL_MODEL': r'Двигатель\s+внутреннего\s+сгорания\s+\(марка,\s+тип\)\s*([^\n]+(?:\n[^\n]+)*?)(?=\n\s*-\s*количество|ОБЩИЕ)',
-            'DVIGATEL_CYLINDRY': r'количество\s+и\s+расположение\s+цилиндров\s*(.+?)(?=\n|-\s*рабочий)',
-            'DVIGATEL_OBEM': r'рабочий\s+объем\s+цилиндров,\s+см³\s*(\d+)',
-            'DVIGATEL_SZHATIYE': r'степень\s+сжатия\s+(.+?)(?=\n|-\s*максимальная)',
-            'DVIGATEL_MOSHNOST': r'максимальная\s+мощность,\s+кВт\s+\(мин-1\)\s*(.+?)(?=\n|Топливо)',
-            'TOPLIVO_TIP': r'Топливо\s+(.+?)(?=\n|Система)',
-            'TOPLIVO_SISTEMA_PITANIYA': r'Система\s+питания\s+\(тип\)\s+(.+?)(?=\n|Система\s+выпуска)',
-            'TOPLIVO_SISTEMA_VIPUSKA': r'Система\s+выпуска\s+и\s+нейтрализации\s+отработавших\s+газов\s*([^\n]+(?:\n[^\n]+)*?)(?=\n\s*Трансмиссия)',
-            'TRANSMISSIYA_TIP': r'Трансмиссия\s+(.+?)(?=\n|Сцепление)',
-            'TRANSMISSIYA_SCEPLENIE': r'Сцепление\s+\(марка,\s+тип\)\s+(.+?)(?=\n|Коробка)',
-            'TRANSMISSIYA_KOROBKA': r'Коробка\s+передач\s+\(марка,\s+тип\)\s*(.+?)(?=\n|Подвеска)',
-            'PODVESKA_PEREDNYAYA': r'Подвеска\s*\(тип\)\s*\n\s*Передняя\s+([^\n]+(?:\n[^\n]+)*?)(?=\n\s*Задняя)',
-            'PODVESKA_ZADNYAYA': r'Задняя\s+([^\n]+(?:\n[^\n]+)*?)(?=\n\s*Рулевое)',
-            'RULEVOE_UPRAVLENIE': r'Рулевое\s+управление\s*(?:\(марка,\s*тип\))?\s*([^\n]+(?:\n[^\n]+)*?)(?=\n\s*Тормозные)',
-            # 'RULEVOE_UPRAVLENIE': r'Рулевое\s+управление\s+\(марка,\s+тип\)\s*(.+?)(?=\n|Тормозные)',
-            'TORMOZNAYA_RABOCHAYA': r'-\s*рабочая\s+([^\n]+(?:\n[^\n]+)*?)(?=\n\s*-\s*запасная)',
-            'TORMOZNAYA_ZAPASNAYA': r'-\s*запасная\s+([^\n]+(?:\n[^\n]+)*?)(?=\n\s*-\s*стояночная)',
-            'TORMOZNAYA_STOYANOCHNAYA': r'-\s*стояночная\s+([^\n]+(?:\n[^\n]+)*?)(?=\n\s*(?:-\s*вспомогательная|Шины))',
-            'TORMOZNAYA_VSPOMOGATELNAYA': r'-\s*вспомогательная\s*\(?износостойкая\)?\s*([^\n]+(?:\n[^\n]+)*?)(?=\n\s*Шины)',
-            'SHINY': r'Шины\s+(.+?)(?=\n|Оборудование)',
-            'OBORUDOVANIE': r'Оборудование\s+транспортного\s+средства\s*(.+?)(?=соответствуют|номер\s+УВЭОС)',
-            'UVEOS': r'номер\s+УВЭОС\s+(\d+)',
-            'BAZOVOE_VIN': r'Идентификационный\s+номер\s+шасси\s+([A-Z0-9]+)',
-            'BAZOVOE_MODIFIKACIYA': r'модификации\s+(\d+)',
-            'DATA_OFORMLENIYA': r'Дата\s+оформления\s+"(\d{2})"\s+([а-я]+)\s+(\d{4})',
-            'TIP_KUZOVA_DVERI': r'(?:Тип\s+кузова\s*/\s*количество\s+дверей|Тип\s+кузова[^\n]*?/[^\n]*?двер(?:ей|и))\s*([^\n]+?)(?=\s*Количество|$)',
-            'NOMER_REGISTRACII': r'№\s*ТС\s*([A-Z]{2}\s*[А-Я]-[A-Z]{2}\.\d+\.\d+)',
-           
-        }
+        # Словари паттернов общие для всех экземпляров (см. PATTERNS и CATEGORY_FIELDS)
+        self.month_map = MONTH_MAP
+        self.patterns = PATTERNS
+        self.category_fields = CATEGORY_FIELDS
+    def set_climate_data(self, df) -> None:
+        """
+        Устанавливает DataFrame с погодой и один раз строит по нему индекс
+        дата -> (температура, влажность) для get_climate_data.
+        """
+        self.df_climate_date = df
+        self._climate_index = {}
+        if df is None:
+            return
+
+        # Находим колонки с датой, температурой и влажностью
+        date_col = None
+        temp_col = None
+        humid_col = None
+
+        for col in df.columns:
+            col_lower = col.lower()
+            if df[col].dtype == 'datetime64[ns]':
+                date_col = col
+            elif 'темп' in col_lower or 'temp' in col_lower:
+                temp_col = col
+            elif 'влаж' in col_lower or 'humid' in col_lower:
+                humid_col = col
+
+        if not all([date_col, temp_col, humid_col]):
+            print("[DEBUG CLIMATE] Не найдены колонки для индекса погоды")
+            return
+
+        # Для каждой даты берем первую строку, как при фильтрации DataFrame
+        for day, temperature, humidity in zip(df[date_col].dt.date, df[temp_col], df[humid_col]):
+            self._climate_index.setdefault(day, (temperature, humidity))
+        print(f"[DEBUG CLIMATE] Индекс погоды построен, дат: {len(self._climate_index)}")
 
-        # Специфические поля для разных категорий
-        self.category_fields = {
-            'M1': {
-                'PASSAZHIROVMESTIMOST': r'Пассажировместимость\s*[:-]?\s*(\d+)',
-                'OBEM_BAGAZHNIKA': r'Объем\s+багажника,\s*л\s*(\d+)',
-                'PODUSHKI_BEZOPASNOSTI': r'Подушки\s+безопасности\s+([^\n]+)',
-                'KLIMAT_USTANOVKA': r'Климатическая\s+установка\s+([^\n]+)',
-                'TIP_KUZOVA_DVERI': r'(?:Тип\s+кузова\s*/\s*количество\s+дверей|Тип\s+кузова[^\n]*?/[^\n]*?двер(?:ей|и))\s*([^\n]+?)(?=\s*Количество|$)',
-                'MESTA_SPEREDI_SZADI': r'(?:Количество\s+мест\s+спереди\s*/\s*сзади|Количество\s+мест[^\n]*?спереди[^\n]*?сзади)\s*(\d+\s*/\s*\d+)',
-                'SHEMA_KOMPONOVKI': r'(?:(?:Схема\s*компоновки\s*транспортного\s*средства|(?:капотная|вагонная|полукапотная|кабина\s+над\s+двигателем|переднеприводная))\s*(.*?))(?=\s*(?:Исполнение|Тип|$))'
-            },
-            'M3': {
-                'PASSAZHIROVMESTIMOST': r'Пассажировместимость\s*[:-]?\s*(\d+)',
-                'MESTA_DLYA_STOYANIYA': r'Места\s+для\s+стояния\s*[:-]?\s*(\d+)',
-                'AVARIYNIE_VYHODY': r'Аварийные\s+выходы\s+([^\n]+)',
-                'MARSHRUTOUKAZATELI': r'Маршрутоуказатели\s+([^\n]+)',
-                'SHEMA_KOMPONOVKI': r'Схема\s+компоновки\s+([^\n]+)'
-            },
-            'N2': {
-                'GRUZOPODYEMNOST': r'Грузоподъемность,\s*кг\s*(\d+)',
-                'OBEM_GRUZOVOGO_OTSEKA': r'Объем\s+грузового\s+отсека,\s*м³\s*(\d+(?:\.\d+)?)',
-                'POGRUZOCHNAYA_VYSOTA': r'Погрузочная\s+высота,\s*мм\s*(\d+)',
-                'SHEMA_KOMPONOVKI': r'Схема\s+компоновки\s+([^\n]+)'
-            },
-            'N3': {
-                'GRUZOPODYEMNOST': r'Грузоподъемность,\s*кг\s*(\d+)',
-                'NAGRUZKA_SSU': r'Нагрузка\s+на\s+седельно-сцепное\s+устройство,\s*кг\s*(\d+)',
-                'MASSA_PRICEPA': r'Масса\s+буксируемого\s+прицепа,\s*кг\s*(\d+)',
-                'SHEMA_KOMPONOVKI': r'Схема\s+компоновки\s+([^\n]+)'
-            },
-            'O4': {
-                'GRUZOPODYEMNOST': r'Грузоподъемность,\s*кг\s*(\d+)',
-                'KOLICHESTVO_OSEY': r'Количество\s+осей\s*[:-]?\s*(\d+)',
-                'NAGRUZKA_SHKVORNYA': r'Нагрузка\s+на\s+шкворень,\s*кг\s*(\d+)',
-                'SHEMA_KOMPONOVKI': r'Схема\s+компоновки\s+([^\n]+)'
-            }
-        }
     def get_climate_data(self, date_str: str) -> Optional[Dict[str, float]]:
         """
         Получает данные о температуре и влажности по дате.
@@ -234,65 +482,87 @@ class PDFParser:
             Optional[Dict[str, float]]: Словарь с температурой и влажностью или None
         """
         try:
-            if not self.df_climate_date is not None:
+            if not self._climate_index:
                 return None
                 
-            # Преобразуем строку в datetime
-            date = datetime.strptime(date_str, '%d.%m.%Y')
-            
-            # Находим колонки с датой, температурой и влажностью
-            date_col = None
-            temp_col = None
-            humid_col = None
-            
-            for col in self.df_climate_date.columns:
-                col_lower = col.lower()
-                if self.df_climate_date[col].dtype == 'datetime64[ns]':
-                    date_col = col
-                elif 'темп' in col_lower or 'temp' in col_lower:
-                    temp_col = col  
-                elif 'влаж' in col_lower or 'humid' in col_lower:
-                    humid_col = col
-
-            if not all([date_col, temp_col, humid_col]):
-                return None
-
-            # Ищем строку с нужной датой
-            row = self.df_climate_date[self.df_climate_date[date_col].dt.date == date.date()]
+            # Преобразуем строку в дату и ищем ее в индексе
+            values = self._climate_index.get(datetime.strptime(date_str, '%d.%m.%Y').date())
             
-            if row.empty:
+            if values is None:
                 return None
                 
             return {
-                'temperature': float(row[temp_col].iloc[0]),
-                'humidity': float(row[humid_col].iloc[0])
+                'temperature': float(values[0]),
+                'humidity': float(values[1])
             }
             
         except Exception as e:
             print(f"Ошибка при получении климатических данных: {str(e)}")
             return None
-    def extract_text_from_pdf(self, pdf_path: str) -> str:
-        """Извлекает текст из PDF файла"""
+    def iter_pdf_pages(self, pdf_path: str) -> Iterator[str]:
+        """Лениво извлекает текст PDF постранично, уже очищенный от колонтитулов"""
         try:
             reader = PdfReader(pdf_path)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text()
-            
-            # Очищаем текст от служебных фраз
-            text = re.sub(r'(?:ОБЩИЕ ХАРАКТЕРИСТИКИ ТРАНСПОРТНОГО СРЕДСТВАМ\.П\.Стр\.\d|ТРАНСПОРТНОЕ СРЕДСТВОМ\.П\.Стр\.\d|М\.П\.Стр\.\d)\s*ТС\s*BY\s*А-BY\.\d+\.\d+Свидетельство\s*о\s*безопасности\s*конструкции\s*транспортного\s*средства\s*№', '', text)
-            print(text)
-            return text
+            yield from clean_pages(page.extract_text() for page in reader.pages)
         except Exception as e:
             raise Exception(f"Ошибка при чтении PDF файла: {str(e)}")
+
+    def extract_text_from_pdf(self, pdf_path: str, stop_early: bool = True) -> str:
+        """
+        Извлекает текст из PDF файла.
+
+        Args:
+            pdf_path: Путь к PDF файлу
+            stop_early: Прекратить извлечение страниц, как только найдена дата
+                оформления - последнее поле сертификата. Приложения после нее
+                не извлекаются
+
+        Если задан кэш текста, повторное извлечение того же файла (по содержимому)
+        берется из кэша без разбора PDF.
+        """
+        if self.text_cache is not None:
+            key = TextCache.file_key(pdf_path, 'early' if stop_early else 'full')
+            text = self.text_cache.get(key)
+            if text is None:
+                text = self._extract_text(pdf_path, stop_early)
+                self.text_cache.put(key, text)
+            return text
+        return self._extract_text(pdf_path, stop_early)
+
+    def _extract_text(self, pdf_path: str, stop_early: bool) -> str:
+        """Извлекает текст из PDF постранично, минуя кэш"""
+        date_pattern = self.patterns['DATA_OFORMLENIYA']
+        pages = self.iter_pdf_pages(pdf_path)
+        text = ""
+        try:
+            for page_text in pages:
+                # Дата могла начаться на предыдущей странице
+                search_from = max(0, len(text) - _DATE_SEARCH_OVERLAP)
+                text += page_text
+                if stop_early:
+                    match = date_pattern.search(text, search_from)
+                    # Год должен быть дочитан: после него в тексте есть еще символы
+                    if match and match.end() < len(text):
+                        break
+        finally:
+            pages.close()
+        return text
             
-    def parse_vehicle_data(self, text):
-        """Извлекает данные о транспортном средстве из текста PDF"""
+    def parse_vehicle_data(self, text, use_sections: bool = True):
+        """
+        Извлекает данные о транспортном средстве из текста PDF.
+
+        Args:
+            text: Текст сертификата
+            use_sections: Искать каждое поле только в его разделе (см. split_sections).
+                False - искать все поля по всему тексту
+        """
         result_data = deepcopy(self.vehicle_data)
+        sections = split_sections(text) if use_sections else {}
         
         # Обрабатываем все поля
         for key, pattern in self.patterns.items():
-            match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+            match = self._search_field(key, pattern, text, sections)
             if match:
                 if key == 'GABARITY':
                     result_data[key] = {
@@ -356,38 +626,18 @@ class PDFParser:
             print(f"[DEBUG PDF] VIN: {result_data['NOMER_REGISTRACII']}")
             
             try:
-                # Проверяем наличие нужной колонки
-                model_column = None
-                for col in self._sbkts_df.columns:
-                    if 'регистрационный' in col.lower() and 'номер' in col.lower() and 'сбктс' in col.lower():
-                        model_column = col
-                        break
-                
-                if model_column is None:
-                    print("[DEBUG PDF] Не найдена колонка")
-                    return result_data
+                row = self.find_sbkts_row(result_data['NOMER_REGISTRACII'])
                 
-                # Ищем строку с нужным VIN
-                vin_mask = self._sbkts_df[model_column].astype(str).str.contains(result_data['NOMER_REGISTRACII'], na=False, case=False, regex=False)
-                matching_row = self._sbkts_df[vin_mask]
-                
-                if not matching_row.empty:
-                    # Берем первую найденную строку
-                    row = matching_row.iloc[0]
-                    
-                    # Ищем нужные колонки и заполняем данные
-                    for col in row.index:
-                        col_lower = col.lower()
-                        if '№' in col and 'п/п' in col:
-                            result_data['SBKTS']['nomer'] = str(row[col])
-                        elif 'дата' in col_lower and 'заяв' in col_lower:
-                            result_data['SBKTS']['data_zayavki'] = row[col].strftime('%d.%m.%Y') if isinstance(row[col], datetime) else str(row[col])
-                        elif 'инженер' in col_lower:
-                            result_data['SBKTS']['inzhener'] = str(row[col])
-                    
-                            print("[DEBUG PDF] Данные СБКТС успешно получены")
-                    else:
-                            print(f"[DEBUG PDF] VIN {result_data['VIN']} не найден в СБКТС")
+                if row is not None:
+                    # Заполняем данные из заранее найденных колонок
+                    for field, col in self._sbkts_columns.items():
+                        value = row[col]
+                        if field == 'data_zayavki' and isinstance(value, datetime):
+                            value = value.strftime('%d.%m.%Y')
+                        result_data['SBKTS'][field] = str(value)
+                    print("[DEBUG PDF] Данные СБКТС успешно получены")
+                else:
+                    print(f"[DEBUG PDF] Номер {result_data['NOMER_REGISTRACII']} не найден в СБКТС")
                     
             except Exception as e:
                 print(f"[DEBUG PDF] Ошибка при обработке СБКТС: {str(e)}")
@@ -401,6 +651,14 @@ class PDFParser:
                     
         return result_data
 
+    def _search_field(self, key: str, pattern: re.Pattern, text: str,
+                      sections: Dict[str, Tuple[int, int]]) -> Optional[re.Match]:
+        """Ищет поле в границах его раздела. Если раздел не найден - по всему тексту"""
+        span = sections.get(SECTION_FIELDS.get(key))
+        if span:
+            return pattern.search(text, *span)
+        return pattern.search(text)
+
     def get_vehicle_data(self):
         return self.vehicle_data 
 
@@ -408,7 +666,7 @@ class PDFParser:
         """Очищает значение от лишних пробелов и символов"""
         if not value:
             return value
-        return re.sub(r'\s+', ' ', value.strip())
+        return _WHITESPACE_RE.sub(' ', value.strip())
 
     
 
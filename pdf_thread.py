@@ -1,8 +1,10 @@
 from PyQt6.QtCore import QThread, pyqtSignal
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Iterator, Optional, Tuple
 from dataclasses import dataclass
-from datetime import datetime
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 import traceback
 from database import Database
 from pdf_parser import PDFParser
@@ -15,6 +17,33 @@ class ProcessingResult:
     data: Dict[str, Any]
     error: str = ""
 
+# Парсер процесса пула, создается один раз в инициализаторе
+_worker_parser: Optional[PDFParser] = None
+
+def _init_worker(excel_path: str, sheet_name: str, sbkts_excel_path: str, sbkts_sheet_name: str,
+                 text_cache_path: str = None):
+    """Инициализация процесса пула: создаем парсер и загружаем Excel данные один раз"""
+    global _worker_parser
+    _worker_parser = PDFParser(
+        excel_path=excel_path,
+        sheet_name=sheet_name,
+        sbkts_excel_path=sbkts_excel_path,
+        sbkts_sheet_name=sbkts_sheet_name,
+        text_cache_path=text_cache_path
+    )
+
+def _parse_pdf_file(file_path: str) -> Tuple[Dict[str, Any], str]:
+    """Извлекает текст и парсит один PDF в процессе пула.
+
+    Returns:
+        Tuple[Dict[str, Any], str]: (данные, текст ошибки) - исключения не пересекают границу процесса
+    """
+    try:
+        text = _worker_parser.extract_text_from_pdf(file_path)
+        return _worker_parser.parse_vehicle_data(text), ""
+    except Exception as e:
+        return {}, str(e)
+
 class PDFProcessThread(QThread):
     progress_updated = pyqtSignal(int)
     file_processed = pyqtSignal(str, dict)
@@ -23,25 +52,26 @@ class PDFProcessThread(QThread):
     stats_updated = pyqtSignal(int, int)
 
     def __init__(self, folder_path: str, excel_path: str = None, sheet_name: str = None, 
-                 sbkts_excel_path: str = None, sbkts_sheet_name: str = None):
+                 sbkts_excel_path: str = None, sbkts_sheet_name: str = None, workers: int = 1,
+                 batch_size: int = 50, text_cache_path: str = 'pdf_text_cache.db'):
         super().__init__()
         self.folder_path = folder_path
         self.excel_path = excel_path
         self.sheet_name = sheet_name
         self.sbkts_excel_path = sbkts_excel_path
         self.sbkts_sheet_name = sbkts_sheet_name
+        # Количество процессов для извлечения и парсинга (1 - обработка в текущем потоке)
+        self.workers = max(1, workers or 1)
+        # Количество файлов, которые записываются в БД одной транзакцией
+        self.batch_size = max(1, batch_size)
+        # Кэш извлеченного текста PDF, общий для всех процессов пула
+        self.text_cache_path = text_cache_path
         self.is_running = True
         self.results: List[ProcessingResult] = []
 
     def run(self):
+        db = None
         try:
-            # Создаем парсер и БД
-            parser = PDFParser(
-                excel_path=self.excel_path,
-                sheet_name=self.sheet_name,
-                sbkts_excel_path=self.sbkts_excel_path,
-                sbkts_sheet_name=self.sbkts_sheet_name
-            )
             db = Database()
             
             # Получаем список PDF файлов
@@ -51,45 +81,34 @@ class PDFProcessThread(QThread):
             if not pdf_files:
                 self.error_occurred.emit("В указанной папке не найдены PDF файлы")
                 return
+
+            if self.workers > 1:
+                parsed_files = self._parse_in_pool(pdf_files)
+            else:
+                parsed_files = self._parse_sequential(pdf_files)
                 
-            # Обрабатываем каждый файл
-            for i, filename in enumerate(pdf_files, 1):
-                if not self.is_running:
-                    break
-                    
-                try:
-                    # Полный путь к файлу
-                    file_path = os.path.join(self.folder_path, filename)
-                    
-                    # Извлекаем текст из PDF
-                    text = parser.extract_text_from_pdf(file_path)
-                    
-                    # Парсим данные используя существующий парсер
-                    data = parser.parse_vehicle_data(text)
+            # Обрабатываем каждый файл. Парсинг может идти в пуле процессов,
+            # а запись в БД идет пачками здесь; сигналы - в исходном порядке файлов
+            pending = []
+            try:
+                for filename, data, error in parsed_files:
+                    if not self.is_running:
+                        break
                     
                     # Проверяем обязательные поля
-                    if not all(data.get(field) for field in ['MARKA', 'VIN', 'GOD_VIPUSKA']):
-                        raise ValueError("Отсутствуют обязательные поля (MARKA, VIN, GOD_VIPUSKA)")
+                    if not error and not all(data.get(field) for field in ['MARKA', 'VIN', 'GOD_VIPUSKA']):
+                        error = "Отсутствуют обязательные поля (MARKA, VIN, GOD_VIPUSKA)"
+                    pending.append((filename, data, error))
                     
-                    # Сохраняем в БД
-                    if db.insert_vehicle_data(data, filename):
-                        result = ProcessingResult(filename=filename, success=True, data=data)
-                        self.file_processed.emit(filename, data)
-                    else:
-                        raise ValueError("Не удалось сохранить данные в БД")
-                        
-                except Exception as e:
-                    error_msg = f"Ошибка обработки {filename}: {str(e)}"
-                    self.error_occurred.emit(error_msg)
-                    result = ProcessingResult(
-                        filename=filename,
-                        success=False,
-                        data={},
-                        error=error_msg
-                    )
+                    if len(pending) >= self.batch_size:
+                        self._flush(db, pending, total_files)
+                        pending = []
                 
-                self.results.append(result)
-                self.progress_updated.emit(int(i / total_files * 100))
+                # Записываем остаток, в том числе при остановке
+                self._flush(db, pending, total_files)
+            finally:
+                # Останавливаем пул, если цикл прерван
+                parsed_files.close()
                 
             # Выводим итоговую статистику
             success_count = sum(1 for r in self.results if r.success)
@@ -103,7 +122,83 @@ class PDFProcessThread(QThread):
         except Exception as e:
             self.error_occurred.emit(f"Критическая ошибка: {str(e)}\n{traceback.format_exc()}")
         finally:
+            if db is not None:
+                db.close()
             self.processing_finished.emit()
+
+    def _flush(self, db: Database, pending: List[Tuple[str, Dict[str, Any], str]], total_files: int):
+        """Записывает пачку распарсенных файлов в БД одной транзакцией и отправляет сигналы по каждому файлу"""
+        if not pending:
+            return
+        saved = iter(db.insert_many(
+            [(data, filename) for filename, data, error in pending if not error],
+            batch_size=self.batch_size
+        ))
+        
+        for filename, data, error in pending:
+            if not error and not next(saved):
+                error = "Не удалось сохранить данные в БД"
+            
+            if error:
+                error_msg = f"Ошибка обработки {filename}: {error}"
+                self.error_occurred.emit(error_msg)
+                result = ProcessingResult(
+                    filename=filename,
+                    success=False,
+                    data={},
+                    error=error_msg
+                )
+            else:
+                result = ProcessingResult(filename=filename, success=True, data=data)
+                self.file_processed.emit(filename, data)
+            
+            self.results.append(result)
+            self.progress_updated.emit(int(len(self.results) / total_files * 100))
+
+    def _parse_sequential(self, pdf_files: List[str]) -> Iterator[Tuple[str, Dict[str, Any], str]]:
+        """Извлекает и парсит файлы по одному в текущем потоке"""
+        parser = PDFParser(
+            excel_path=self.excel_path,
+            sheet_name=self.sheet_name,
+            sbkts_excel_path=self.sbkts_excel_path,
+            sbkts_sheet_name=self.sbkts_sheet_name,
+            text_cache_path=self.text_cache_path
+        )
+        for filename in pdf_files:
+            try:
+                text = parser.extract_text_from_pdf(os.path.join(self.folder_path, filename))
+                yield filename, parser.parse_vehicle_data(text), ""
+            except Exception as e:
+                yield filename, {}, str(e)
+
+    def _parse_in_pool(self, pdf_files: List[str]) -> Iterator[Tuple[str, Dict[str, Any], str]]:
+        """Извлекает и парсит файлы в пуле процессов, возвращая результаты в исходном порядке.
+
+        В пул одновременно отправляется не больше workers * 4 файлов, чтобы готовые
+        результаты не накапливались в памяти, если запись в БД отстает.
+        """
+        window = self.workers * 4
+        files = iter(pdf_files)
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.excel_path, self.sheet_name, self.sbkts_excel_path, self.sbkts_sheet_name,
+                      self.text_cache_path)
+        )
+        try:
+            pending = deque(
+                (filename, executor.submit(_parse_pdf_file, os.path.join(self.folder_path, filename)))
+                for filename in islice(files, window)
+            )
+            while pending:
+                filename, future = pending.popleft()
+                data, error = future.result()
+                next_file = next(files, None)
+                if next_file is not None:
+                    pending.append((next_file, executor.submit(_parse_pdf_file, os.path.join(self.folder_path, next_file))))
+                yield filename, data, error
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
             
     def stop(self):
-        self.is_running = False 
\ No newline at end of file
+        self.is_running = False 
@@ -1,9 +1,16 @@
 import mysql.connector
 import sqlite3
+import base64
+import hashlib
 import json
+import zlib
 import logging
+import threading
+import time
+from collections import Counter
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Iterator, Tuple
+from database import Database as VehiclesDatabase
 
 # Настройка логирования
 logging.basicConfig(
@@ -12,6 +19,78 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Сколько строк отправляется одним INSERT ... VALUES (...), (...)
+SEND_BATCH_SIZE = 500
+# Предел размера одного INSERT в байтах, с запасом меньше max_allowed_packet сервера
+SEND_MAX_PACKET_SIZE = 4 * 1024 * 1024
+# Оценка байт запроса на строку сверх самих данных: скобки, user_id, разделители
+_ROW_OVERHEAD = 32
+# Сколько data_id подтверждается одним UPDATE ... WHERE data_id IN (...)
+SYNC_ACK_CHUNK_SIZE = 1000
+# Сколько изменений из user_data читается и применяется за один шаг синхронизации
+SYNC_PAGE_SIZE = 1000
+
+# Версия компактного формата data в user_data (см. encode_payload)
+PAYLOAD_VERSION = 2
+# Словарь колонок компактного формата: вместо имени колонки хранится ее номер.
+# Список можно только дополнять в конец, иначе старые записи прочитаются неверно
+PAYLOAD_COLUMNS = (
+    'id', 'filename', 'parsed_at', 'MARKA', 'KOMMERCHESKOE_NAIMENOVANIE', 'TIP', 'SHASSI',
+    'KATEGORIA', 'VIN', 'GOD_VIPUSKA', 'NOMER_REGISTRACII', 'DVIGATEL_MODEL', 'DVIGATEL_CYLINDRY',
+    'DVIGATEL_MOSHNOST', 'DVIGATEL_OBEM', 'DVIGATEL_SZHATIYE', 'ZAYAVITEL', 'IZGOTOVITEL',
+    'SBOROCHNIY_ZAVOD', 'TOPLIVO_TIP', 'TOPLIVO_SISTEMA_PITANIYA', 'TOPLIVO_SISTEMA_VIPUSKA',
+    'TRANSMISSIYA_TIP', 'TRANSMISSIYA_SCEPLENIE', 'TRANSMISSIYA_KOROBKA', 'PODVESKA_PEREDNYAYA',
+    'PODVESKA_ZADNYAYA', 'RULEVOE_UPRAVLENIE', 'TORMOZNAYA_RABOCHAYA', 'TORMOZNAYA_ZAPASNAYA',
+    'TORMOZNAYA_STOYANOCHNAYA', 'TORMOZNAYA_VSPOMOGATELNAYA', 'GABARITY_DLINA', 'GABARITY_SHIRINA',
+    'GABARITY_VYSOTA', 'MASSA_SNARYAZHENNAYA', 'MASSA_MAKSIMALNAYA', 'BAZA', 'KOLEYA',
+    'EKOLOGICHESKIY_KLASS', 'KOLESNAYA_FORMULA', 'SHEMA_KOMPONOVKI', 'ZAGRUZOCHNOE_PROSTRANSTVO',
+    'KABINA', 'TIP_KUZOVA_DVERI', 'MESTA', 'SHINY', 'OBORUDOVANIE', 'UVEOS', 'BAZOVOE_VIN',
+    'BAZOVOE_MODIFIKACIYA', 'SBKTS_NOMER', 'SBKTS_DATA_ZAYAVKI', 'SBKTS_INZHENER',
+    'DATA_OFORMLENIYA', 'DAY', 'MONTH', 'suspicious', 'in_archive', 'temperature', 'humidity',
+)
+_PAYLOAD_CODES = {column: code for code, column in enumerate(PAYLOAD_COLUMNS)}
+# Сжатый data отправляется, только если JSON строки длиннее этого числа байт
+PAYLOAD_COMPRESS_MIN_SIZE = 256
+
+
+def encode_payload(row: Dict[str, Any], compress: bool = False) -> str:
+    """
+    Компактный data для user_data: {"v": 2, "k": [...], "r": [...]}.
+    
+    Поля со значением NULL не передаются, колонки из PAYLOAD_COLUMNS
+    записываются номером (остальные - именем). Передаются все непустые поля
+    строки, а не только измененные: исходных значений отправленных строк
+    таблица не хранит, сравнивать не с чем. При compress данные длиннее
+    PAYLOAD_COMPRESS_MIN_SIZE сжимаются zlib: {"v": 2, "z": "<base64>"}.
+    Результат всегда корректный JSON только из ASCII, как и прежний формат,
+    поэтому не зависит от кодировки соединения и колонки data на сервере.
+    """
+    fields = [(column, value) for column, value in row.items() if value is not None]
+    payload = json.dumps({
+        'v': PAYLOAD_VERSION,
+        'k': [_PAYLOAD_CODES.get(column, column) for column, _ in fields],
+        'r': [value for _, value in fields],
+    }, separators=(',', ':'))
+    if compress:
+        raw = payload.encode('utf-8')
+        if len(raw) > PAYLOAD_COMPRESS_MIN_SIZE:
+            packed = json.dumps({'v': PAYLOAD_VERSION, 'z': base64.b64encode(zlib.compress(raw, 9)).decode('ascii')},
+                                separators=(',', ':'))
+            if len(packed) < len(raw):
+                return packed
+    return payload
+
+
+def decode_payload(data) -> Dict[str, Any]:
+    """Словарь колонок строки из data user_data в прежнем (полный JSON строки) или компактном формате"""
+    payload = json.loads(data)
+    if not isinstance(payload, dict) or payload.get('v') != PAYLOAD_VERSION:
+        return payload
+    if 'z' in payload:
+        payload = json.loads(zlib.decompress(base64.b64decode(payload['z'])))
+    return {PAYLOAD_COLUMNS[key] if isinstance(key, int) else key: value
+            for key, value in zip(payload['k'], payload['r'])}
+
 class DatabaseError(Exception):
     """Базовый класс для исключений базы данных"""
     pass
@@ -24,6 +103,105 @@ class SQLiteConnectionError(DatabaseError):
     """Исключение при ошибке подключения к SQLite"""
     pass
 
+class MySQLPool:
+    """
+    Пул соединений MySQL, общий для всех потоков процесса (см. get_pool).
+
+    Соединения открываются по требованию и после операции возвращаются в
+    пул, поэтому повторные отправка, синхронизация и загрузка пользователей
+    не тратят время на TCP-соединение и авторизацию. Соединение, простоявшее
+    дольше ping_after секунд, перед выдачей проверяется ping, простоявшее
+    дольше max_idle секунд - закрывается. Свободных соединений хранится не
+    больше max_idle_connections.
+    """
+
+    def __init__(self, config: Dict[str, Any], max_idle_connections: int = 4,
+                 max_idle: float = 300, ping_after: float = 30):
+        self.config = config
+        self.max_idle_connections = max_idle_connections
+        self.max_idle = max_idle
+        self.ping_after = ping_after
+        self._idle: List[Tuple[Any, float]] = []  # (соединение, время возврата в пул)
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def _evict(self, now: float) -> List[Any]:
+        """Убирает из пула давно простаивающие соединения и возвращает их для закрытия"""
+        expired = [conn for conn, released in self._idle if now - released > self.max_idle]
+        if expired:
+            self._idle = [(conn, released) for conn, released in self._idle if now - released <= self.max_idle]
+        return expired
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Свободное рабочее соединение из пула или новое"""
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                expired = self._evict(now)
+                conn, released = self._idle.pop() if self._idle else (None, None)
+            for stale in expired:
+                self._close(stale)
+            if conn is None:
+                return mysql.connector.connect(**self.config)
+            if now - released <= self.ping_after:
+                return conn
+            try:
+                conn.ping(reconnect=False)
+                return conn
+            except mysql.connector.Error:
+                self.logger.info("Соединение MySQL из пула недоступно, открываем другое")
+                self._close(conn)
+
+    def release(self, conn, broken: bool = False):
+        """
+        Возвращает соединение в пул. Незавершенная транзакция откатывается.
+        Соединение, на котором операция завершилась ошибкой (broken), закрывается:
+        недавно возвращенные соединения выдаются без ping
+        """
+        if broken:
+            self._close(conn)
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            self._close(conn)
+            return
+        now = time.monotonic()
+        with self._lock:
+            expired = self._evict(now)
+            if len(self._idle) < self.max_idle_connections:
+                self._idle.append((conn, now))
+            else:
+                expired.append(conn)
+        for stale in expired:
+            self._close(stale)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+_pools: Dict[Tuple, MySQLPool] = {}
+_pools_lock = threading.Lock()
+
+def get_pool(config: Dict[str, Any]) -> MySQLPool:
+    """Пул соединений процесса для конфигурации config"""
+    key = tuple(sorted((name, str(value)) for name, value in config.items()))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = MySQLPool(dict(config))
+        return pool
+
 class DataSync:
     def __init__(self, mysql_config: Dict[str, Any], sqlite_path: str):
         """
@@ -36,10 +214,15 @@ class DataSync:
         self.mysql_config = mysql_config
         self.sqlite_path = sqlite_path
         self.logger = logging.getLogger(__name__)
+        self.pool = get_pool(mysql_config)
+        # Изменения значений vehicles последней синхронизации для счетчиков
+        # фильтров: колонка -> отображаемое значение -> изменение количества строк
+        self.value_deltas: Dict[str, Counter] = {}
 
     def _connect_mysql(self) -> tuple:
         """
-        Установка соединения с MySQL.
+        Соединение с MySQL из общего пула. После работы его нужно вернуть
+        через _release_mysql.
         
         Returns:
             tuple: (connection, cursor)
@@ -48,7 +231,7 @@ class DataSync:
             MySQLConnectionError: При ошибке подключения к MySQL
         """
         try:
-            conn = mysql.connector.connect(**self.mysql_config)
+            conn = self.pool.acquire()
             cursor = conn.cursor(dictionary=True)
             return conn, cursor
         except mysql.connector.Error as e:
@@ -56,6 +239,14 @@ class DataSync:
             self.logger.error(error_msg)
             raise MySQLConnectionError(error_msg)
 
+    def _release_mysql(self, conn, cursor, broken: bool = False):
+        """Закрывает курсор и возвращает соединение в пул (после ошибки - закрывает)"""
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        self.pool.release(conn, broken)
+
     def _connect_sqlite(self) -> tuple:
         """
         Установка соединения с SQLite.
@@ -75,17 +266,47 @@ class DataSync:
             self.logger.error(error_msg)
             raise SQLiteConnectionError(error_msg)
 
-    def send_to_mysql(self, data: List[Dict[str, Any]], user_id: int) -> bool:
+    @staticmethod
+    def _chunks(payloads: List[str], batch_size: int, max_packet_size: int) -> Iterator[List[str]]:
+        """
+        Делит строки на пачки не больше batch_size строк и примерно не больше
+        max_packet_size байт запроса. Строка больше предела уходит отдельной пачкой
+        """
+        chunk, size = [], 0
+        for payload in payloads:
+            # Кавычки и обратные слэши при отправке экранируются
+            payload_size = len(payload.encode('utf-8')) + payload.count('"') + payload.count('\\') + _ROW_OVERHEAD
+            if chunk and (len(chunk) >= batch_size or size + payload_size > max_packet_size):
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(payload)
+            size += payload_size
+        if chunk:
+            yield chunk
+
+    def send_to_mysql(self, data: List[Dict[str, Any]], user_id: int,
+                      batch_size: int = SEND_BATCH_SIZE, max_packet_size: int = SEND_MAX_PACKET_SIZE,
+                      progress: Optional[Callable[[int, int], None]] = None,
+                      compress: bool = False) -> bool:
         """
         Отправка данных на сервер MySQL.
         
+        Строки уходят многострочными INSERT по batch_size строк и не больше
+        max_packet_size байт, все пачки - в одной транзакции. data каждой
+        строки записывается в компактном формате (см. encode_payload).
+        
         Args:
             data: Список словарей с данными
             user_id: ID пользователя
+            batch_size: Максимум строк в одном INSERT
+            max_packet_size: Примерный предел размера одного INSERT в байтах
+            progress: Вызывается после каждой пачки с (отправлено строк, всего строк)
+            compress: Сжимать data строк zlib
         
         Returns:
             bool: True если данные успешно отправлены, False в случае ошибки
         """
+        broken = False
         try:
             conn, cursor = self._connect_mysql()
             
@@ -94,13 +315,19 @@ class DataSync:
             if not cursor.fetchone():
                 raise ValueError(f"Пользователь с ID {user_id} не найден")
 
-            # Вставляем данные
-            for row in data:
-                query = """
-                INSERT INTO user_data (user_id, data, updated)
-                VALUES (%s, %s, 1)
-                """
-                cursor.execute(query, (user_id, json.dumps(row)))
+            # Вставляем данные пачками: executemany собирает из пачки один
+            # INSERT ... VALUES (...), (...), то есть один обмен с сервером
+            query = """
+            INSERT INTO user_data (user_id, data, updated)
+            VALUES (%s, %s, 1)
+            """
+            payloads = [encode_payload(row, compress) for row in data]
+            sent = 0
+            for chunk in self._chunks(payloads, batch_size, max_packet_size):
+                cursor.executemany(query, [(user_id, payload) for payload in chunk])
+                sent += len(chunk)
+                if progress:
+                    progress(sent, len(payloads))
 
             conn.commit()
             self.logger.info(f"Успешно отправлено {len(data)} записей для пользователя {user_id}")
@@ -110,95 +337,201 @@ class DataSync:
             self.logger.error(f"Ошибка при отправке данных: {str(e)}")
             return False
         except Exception as e:
+            broken = True
             self.logger.error(f"Неожиданная ошибка при отправке данных: {str(e)}")
             return False
         finally:
             if 'conn' in locals():
-                cursor.close()
-                conn.close()
+                self._release_mysql(conn, cursor, broken)
 
-    def sync_with_sqlite(self) -> bool:
+    def sync_with_sqlite(self, page_size: int = SYNC_PAGE_SIZE) -> bool:
         """
         Синхронизация данных из MySQL в SQLite.
         
+        Изменения читаются страницами по page_size в порядке data_id, поэтому
+        память не зависит от размера очереди. Страница применяется к vehicles
+        вместе с записью ее data_id в sync_state одной транзакцией SQLite,
+        затем подтверждается в MySQL. Если синхронизация прервалась между
+        этими шагами, следующая сначала подтверждает записи из sync_state,
+        data которых на сервере с тех пор не изменилась.
+        
         Returns:
             bool: True если синхронизация успешна, False в случае ошибки
         """
+        broken = False
+        self.value_deltas = {}
         try:
+            # Схема SQLite (в том числе sync_state) - по миграциям database.py
+            VehiclesDatabase(self.sqlite_path).close()
+
             # Подключаемся к обеим базам
             mysql_conn, mysql_cursor = self._connect_mysql()
             sqlite_conn, sqlite_cursor = self._connect_sqlite()
 
-            # Получаем обновленные записи из MySQL
-            mysql_cursor.execute("""
-                SELECT data_id, user_id, data 
-                FROM user_data 
-                WHERE updated = 1
-            """)
-            changes = mysql_cursor.fetchall()
+            pending = dict(sqlite_cursor.execute("SELECT data_id, data_hash FROM sync_state"))
+            if pending:
+                # Прошлая синхронизация прервалась: эти записи уже применены
+                # в SQLite, осталось подтвердить их в MySQL. Записи, которые
+                # редактор с тех пор изменил, остаются и будут прочитаны заново
+                unchanged = self._unchanged_ids(mysql_cursor, pending)
+                self.logger.info(f"Подтверждение {len(unchanged)} из {len(pending)} записей прерванной синхронизации")
+                self._acknowledge(mysql_cursor, unchanged)
+                mysql_conn.commit()
+                sqlite_cursor.execute("DELETE FROM sync_state")
+                sqlite_conn.commit()
 
-            if not changes:
-                self.logger.info("Нет данных для синхронизации")
-                return True
+            last_id = 0
+            total = 0
+            while True:
+                # Получаем следующую страницу обновленных записей из MySQL
+                mysql_cursor.execute("""
+                    SELECT data_id, user_id, data 
+                    FROM user_data 
+                    WHERE updated = 1 AND data_id > %s
+                    ORDER BY data_id
+                    LIMIT %s
+                """, (last_id, page_size))
+                changes = mysql_cursor.fetchall()
+                if not changes:
+                    break
 
-            # Обновляем данные в SQLite
-            for change in changes:
-                data = json.loads(change['data'])
-                
-                # Проверяем наличие id в данных
-                if 'id' not in data:
-                    self.logger.warning(f"Пропущена запись без id: {data}")
-                    continue
-                    
-                record_id = data['id']
-                
-                # Формируем SET часть запроса для UPDATE
-                set_parts = []
-                values = []
-                for column, value in data.items():
-                    if column != 'id':  # Пропускаем id в SET
-                        set_parts.append(f"{column} = ?")
-                        values.append(value)
-                
-                # Добавляем id в конец для WHERE условия
-                values.append(record_id)
-                
-                query = f"""
-                UPDATE vehicles 
-                SET {', '.join(set_parts)}
-                WHERE id = ?
-                """
-                
-                sqlite_cursor.execute(query, values)
+                # Применяем страницу и запоминаем ее data_id одной транзакцией.
+                # Предыдущая страница к этому моменту уже подтверждена
+                applied_ids, deltas = self._apply_changes(sqlite_cursor, changes)
+                hashes = {change['data_id']: self._data_hash(change['data']) for change in changes}
+                sqlite_cursor.execute("DELETE FROM sync_state")
+                sqlite_cursor.executemany("INSERT INTO sync_state (data_id, data_hash) VALUES (?, ?)",
+                                          [(data_id, hashes[data_id]) for data_id in applied_ids])
+                sqlite_conn.commit()
+                for column, delta in deltas.items():
+                    self.value_deltas.setdefault(column, Counter()).update(delta)
 
-                # Отмечаем запись как синхронизированную в MySQL
-                mysql_cursor.execute("""
-                    UPDATE user_data 
-                    SET updated = 0 
-                    WHERE data_id = %s
-                """, (change['data_id'],))
-            print(f"Успешно синхронизировано {len(changes)} записей")
-            # Сохраняем изменения
+                # Отмечаем записи как синхронизированные в MySQL
+                self._acknowledge(mysql_cursor, applied_ids)
+                mysql_conn.commit()
+                last_id = changes[-1]['data_id']
+
+                total += len(changes)
+                if len(changes) < page_size:
+                    break
+
+            sqlite_cursor.execute("DELETE FROM sync_state")
             sqlite_conn.commit()
-            mysql_conn.commit()
 
-            self.logger.info(f"Успешно синхронизировано {len(changes)} записей")
+            if not total:
+                self.logger.info("Нет данных для синхронизации")
+                return True
+
+            print(f"Успешно синхронизировано {total} записей")
+            self.logger.info(f"Успешно синхронизировано {total} записей")
             return True
 
         except (MySQLConnectionError, SQLiteConnectionError) as e:
             self.logger.error(f"Ошибка подключения при синхронизации: {str(e)}")
             return False
         except Exception as e:
+            broken = True
             self.logger.error(f"Неожиданная ошибка при синхронизации: {str(e)}")
             return False
         finally:
             if 'mysql_conn' in locals():
-                mysql_cursor.close()
-                mysql_conn.close()
+                self._release_mysql(mysql_conn, mysql_cursor, broken)
             if 'sqlite_conn' in locals():
                 sqlite_cursor.close()
                 sqlite_conn.close()
 
+    def _apply_changes(self, sqlite_cursor, changes: List[Dict[str, Any]]) -> Tuple[List[int], Dict[str, Counter]]:
+        """
+        Применяет изменения из user_data к vehicles и возвращает data_id
+        примененных записей и изменения количества строк по отображаемым
+        значениям колонок (для счетчиков фильтров).
+        
+        Изменения одной записи сливаются в порядке data_id (более позднее
+        значение колонки побеждает), затем записи с одинаковым набором колонок
+        обновляются одним executemany.
+        """
+        merged: Dict[Any, Dict[str, Any]] = {}
+        applied_ids = []
+        for change in changes:
+            data = decode_payload(change['data'])
+            
+            # Проверяем наличие id в данных
+            if 'id' not in data:
+                self.logger.warning(f"Пропущена запись без id: {data}")
+                continue
+            
+            record_id = data.pop('id')
+            merged.setdefault(record_id, {}).update(data)
+            applied_ids.append(change['data_id'])
+        
+        # Набор колонок -> параметры UPDATE для записей с этим набором
+        groups: Dict[tuple, List[list]] = {}
+        for record_id, data in merged.items():
+            if data:
+                columns = tuple(sorted(data))
+                groups.setdefault(columns, []).append([data[column] for column in columns] + [record_id])
+        
+        # Значения до и после обновления: SQLite может привести тип значения
+        all_columns = sorted({column for data in merged.values() for column in data})
+        before = self._read_values(sqlite_cursor, list(merged), all_columns)
+        for columns, params in groups.items():
+            set_parts = ', '.join(f'"{column}" = ?' for column in columns)
+            sqlite_cursor.executemany(f"UPDATE vehicles SET {set_parts} WHERE id = ?", params)
+        after = self._read_values(sqlite_cursor, list(before), all_columns)
+        
+        deltas: Dict[str, Counter] = {}
+        for record_id, old_values in before.items():
+            for column, old_value, new_value in zip(all_columns, old_values, after[record_id]):
+                old_text, new_text = str(old_value), str(new_value)
+                if old_text != new_text:
+                    delta = deltas.setdefault(column, Counter())
+                    delta[old_text] -= 1
+                    delta[new_text] += 1
+        return applied_ids, deltas
+
+    @staticmethod
+    def _read_values(sqlite_cursor, record_ids: List[Any], columns: List[str]) -> Dict[Any, tuple]:
+        """Значения колонок columns записей vehicles: ID -> кортеж значений"""
+        if not record_ids or not columns:
+            return {}
+        column_list = ', '.join(f'"{column}"' for column in columns)
+        sqlite_cursor.execute(f"SELECT id, {column_list} FROM vehicles WHERE id IN (SELECT value FROM json_each(?))",
+                              (json.dumps(record_ids),))
+        return {row[0]: row[1:] for row in sqlite_cursor.fetchall()}
+
+    @staticmethod
+    def _data_hash(data) -> str:
+        """Хэш data записи user_data, чтобы заметить ее повторное изменение"""
+        return hashlib.sha1(data.encode('utf-8') if isinstance(data, str) else bytes(data)).hexdigest()
+
+    def _unchanged_ids(self, mysql_cursor, pending: Dict[int, str]) -> List[int]:
+        """
+        data_id из pending, которые на сервере все еще ждут синхронизации с
+        той же data. Строки блокируются (FOR UPDATE) до подтверждения, чтобы
+        редактор не изменил их между проверкой и подтверждением
+        """
+        data_ids = sorted(pending)
+        unchanged = []
+        for start in range(0, len(data_ids), SYNC_ACK_CHUNK_SIZE):
+            chunk = data_ids[start:start + SYNC_ACK_CHUNK_SIZE]
+            mysql_cursor.execute(
+                f"SELECT data_id, data FROM user_data "
+                f"WHERE updated = 1 AND data_id IN ({', '.join(['%s'] * len(chunk))}) FOR UPDATE",
+                chunk
+            )
+            unchanged.extend(row['data_id'] for row in mysql_cursor.fetchall()
+                             if self._data_hash(row['data']) == pending[row['data_id']])
+        return unchanged
+
+    def _acknowledge(self, mysql_cursor, data_ids: List[int]):
+        """Снимает флаг updated у записей user_data, по одному запросу на SYNC_ACK_CHUNK_SIZE записей"""
+        for start in range(0, len(data_ids), SYNC_ACK_CHUNK_SIZE):
+            chunk = data_ids[start:start + SYNC_ACK_CHUNK_SIZE]
+            mysql_cursor.execute(
+                f"UPDATE user_data SET updated = 0 WHERE data_id IN ({', '.join(['%s'] * len(chunk))})",
+                chunk
+            )
+
     def get_sync_status(self) -> Optional[Dict[str, int]]:
         """
         Получение статуса синхронизации.
@@ -206,6 +539,7 @@ class DataSync:
         Returns:
             Dict[str, int]: Словарь с количеством записей, ожидающих синхронизации
         """
+        broken = False
         try:
             conn, cursor = self._connect_mysql()
             cursor.execute("""
@@ -216,12 +550,12 @@ class DataSync:
             result = cursor.fetchone()
             return {"pending_updates": result['count']}
         except Exception as e:
+            broken = True
             self.logger.error(f"Ошибка при получении статуса синхронизации: {str(e)}")
             return None
         finally:
             if 'conn' in locals():
-                cursor.close()
-                conn.close()
+                self._release_mysql(conn, cursor, broken)
 
     def get_users(self) -> Optional[List[Dict[str, Any]]]:
         """
@@ -235,6 +569,7 @@ class DataSync:
             - email: Email пользователя
             Возвращает None в случае ошибки
         """
+        broken = False
         try:
             conn, cursor = self._connect_mysql()
             cursor.execute("""
@@ -255,12 +590,12 @@ class DataSync:
             self.logger.error(f"Ошибка подключения при получении списка пользователей: {str(e)}")
             return None
         except Exception as e:
+            broken = True
             self.logger.error(f"Неожиданная ошибка при получении списка пользователей: {str(e)}")
             return None
         finally:
             if 'conn' in locals():
-                cursor.close()
-                conn.close()
+                self._release_mysql(conn, cursor, broken)
 
 # Пример использования:
 if __name__ == "__main__":
@@ -2,22 +2,42 @@ import sys
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QTableView, QVBoxLayout, QWidget, 
                             QMessageBox, QDialog, QLineEdit, QPushButton, QMenu, QCheckBox,
                             QScrollArea, QVBoxLayout, QPlainTextEdit, QHBoxLayout, QFrame, QWidgetAction,
-                            QLabel, QStyledItemDelegate)
-from PyQt6.QtCore import Qt, QSortFilterProxyModel, QAbstractTableModel, QEvent
-from PyQt6.QtGui import QAction, QColor, QCursor, QPainter, QPalette
+                            QLabel, QStyledItemDelegate, QListView)
+from PyQt6.QtCore import Qt, QSortFilterProxyModel, QAbstractTableModel, QAbstractListModel, QEvent, QModelIndex
+from PyQt6.QtGui import QAction, QBrush, QColor, QCursor, QKeySequence, QPainter
 import sqlite3
+import json
+from collections import Counter, OrderedDict, deque
 from PyQt6.QtWidgets import QToolTip
 from PyQt6.QtCore import QTimer
 from sql_to_myaql import DataSync
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Optional, Tuple
 from document_generator import generate_documents
 from PyQt6.QtWidgets import QComboBox
-from db_thread import DBWorker, SyncWorker
+from db_thread import DBWorker, SyncWorker, LoadWorker
+from database import Database as VehiclesDatabase
+from column_store import ColumnStore
+
+# Начиная с этого количества записей таблица читается из БД страницами по мере
+# прокрутки (PagedTableModel), а не загружается в память целиком
+LAZY_LOAD_THRESHOLD = 20000
+# Сколько первых строк просматривается для ширины колонок без статистики в БД
+WIDTH_SAMPLE_ROWS = 200
+# Сколько ID передается в один DELETE ... IN (...), меньше лимита параметров SQLite
+DELETE_CHUNK_SIZE = 500
+# При большем числе непрерывных диапазонов удаляемых строк модель сбрасывается целиком
+MAX_REMOVE_RANGES = 100
+# Сколько последних редактирований можно отменить
+UNDO_LIMIT = 50
+# Роль модели: True, если отображаемое значение ячейки пустое (подсветка в EmptyCellDelegate)
+EMPTY_ROLE = Qt.ItemDataRole.UserRole + 1
 
 class Database:
     def __init__(self):
         self.connection = None
         self.cursor = None
+        # Внутри begin() ... commit() execute не фиксирует каждый запрос отдельно
+        self._in_transaction = False
         self.connect()
 
     def connect(self):
@@ -32,18 +52,42 @@ class Database:
         if self.connection:
             self.connection.close()
 
+    def begin(self):
+        self.cursor.execute("BEGIN")
+        self._in_transaction = True
+
+    def commit(self):
+        self.connection.commit()
+        self._in_transaction = False
+
+    def rollback(self):
+        self.connection.rollback()
+        self._in_transaction = False
+
     def execute(self, query, params=None):
         try:
             if params:
                 self.cursor.execute(query, params)
             else:
                 self.cursor.execute(query)
-            self.connection.commit()
+            if not self._in_transaction:
+                self.connection.commit()
             return True
         except Exception as e:
             print(f"Ошибка выполнения запроса: {e}")
             return False
 
+    def update_values(self, column_name: str, changes: List[Tuple[Any, Any]]) -> int:
+        """
+        Записывает значения колонки column_name одним executemany.
+        changes - пары (ID записи, значение). Возвращает количество измененных строк
+        """
+        self.cursor.executemany(f'UPDATE vehicles SET "{column_name}" = ? WHERE id = ?',
+                                [(value, row_id) for row_id, value in changes])
+        if not self._in_transaction:
+            self.connection.commit()
+        return self.cursor.rowcount
+
     def fetch_all(self, query, params=None):
         try:
             if params:
@@ -58,14 +102,17 @@ class Database:
 class TableModel(QAbstractTableModel):
     def __init__(self, data=None, headers=None):
         super().__init__()
-        self._data = data or []
         self._headers = headers or []
-        self._original_data = data.copy() if data else []
         self._column_types = {}
+        # Значения хранятся по колонкам, см. ColumnStore
+        self._store = ColumnStore(len(self._headers), rows=data)
         self._filtered_columns = set()
+        self._row_by_id: Optional[Dict[Any, int]] = None  # ID записи -> номер строки, строится по запросу
         
     def set_column_types(self, types):
         self._column_types = types
+        # Числовые колонки переходят в типизированные массивы
+        self._store = ColumnStore(len(self._headers), types, self._store.rows())
         
     def set_column_filtered(self, column, is_filtered):
         if is_filtered:
@@ -90,28 +137,510 @@ class TableModel(QAbstractTableModel):
         return None
 
     def rowCount(self, parent):
-        return len(self._data)
+        return len(self._store)
 
     def columnCount(self, parent):
         return len(self._headers)
 
     def data(self, index, role):
         if role == Qt.ItemDataRole.DisplayRole:
-            return str(self._data[index.row()][index.column()])
+            row = index.row()
+            # Строки экрана обычно уже в кэше: без вызова метода на каждую ячейку
+            return (self._store.display_rows.get(row) or self._store.display_row(row))[index.column()]
+        if role == EMPTY_ROLE:
+            return self._store.is_blank(index.row(), index.column())
         return None
 
     def setData(self, index, value, role):
         if role == Qt.ItemDataRole.EditRole:
-            self._data[index.row()][index.column()] = value
+            self._store.set(index.row(), index.column(), value)
             return True
         return False
 
     def removeRow(self, row):
         self.beginRemoveRows(self.index(row, 0).parent(), row, row)
-        del self._data[row]
+        self._store.delete(row, row + 1)
+        # Номера следующих строк сдвинулись
+        self._row_by_id = None
         self.endRemoveRows()
         return True
 
+    def append_rows(self, rows: List[List[Any]]):
+        """Добавляет пачку строк в конец таблицы"""
+        if not rows:
+            return
+        first = len(self._store)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._store.append_rows(rows)
+        if self._row_by_id is not None:
+            self._row_by_id.update((values[0], first + i) for i, values in enumerate(rows))
+        self.endInsertRows()
+
+    def remove_rows(self, rows):
+        """Удаляет строки rows, по одному сигналу на непрерывный диапазон"""
+        rows = sorted(set(rows), reverse=True)
+        ranges = sum(1 for i, row in enumerate(rows) if i + 1 == len(rows) or rows[i + 1] != row - 1)
+        if ranges > MAX_REMOVE_RANGES:
+            # Прокси обрабатывает каждый диапазон отдельно: при разрозненных
+            # строках (удаление отфильтрованных) быстрее перестроить модель
+            removed = set(rows)
+            self.beginResetModel()
+            self._store.delete_rows(removed)
+            self._row_by_id = None
+            self.endResetModel()
+            return
+        end = None
+        for i, row in enumerate(rows):
+            if end is None:
+                end = row
+            if i + 1 == len(rows) or rows[i + 1] != row - 1:
+                self.beginRemoveRows(QModelIndex(), row, end)
+                self._store.delete(row, end + 1)
+                self.endRemoveRows()
+                end = None
+        if rows:
+            self._row_by_id = None
+
+    def find_row(self, row_id) -> Optional[int]:
+        """Номер строки с записью row_id или None"""
+        if self._row_by_id is None:
+            self._row_by_id = {row_id: row for row, row_id in enumerate(self._store.column_values(0))}
+        return self._row_by_id.get(row_id)
+
+    def _set_value(self, row, column, value):
+        """Записывает значение ячейки в памяти модели без уведомления представления"""
+        self._store.set(row, column, value)
+
+    def set_column_value(self, row_ids, column, value) -> int:
+        """Записывает одно значение value в колонку column строк с записями row_ids"""
+        return self.set_column_values(column, {row_id: value for row_id in row_ids})
+
+    def set_column_values(self, column, values_by_id: Dict[Any, Any]) -> int:
+        """
+        Записывает значения колонки column по ID записей и сообщает
+        представлению об изменении непрерывными диапазонами строк. Возвращает
+        количество найденных строк
+        """
+        found = {}
+        for row_id, value in values_by_id.items():
+            row = self.find_row(row_id)
+            if row is not None:
+                found[row] = value
+        rows = sorted(found)
+        for row in rows:
+            self._set_value(row, column, found[row])
+        
+        start = None
+        for i, row in enumerate(rows):
+            if start is None:
+                start = row
+            if i + 1 == len(rows) or rows[i + 1] != row + 1:
+                self.dataChanged.emit(self.index(start, column), self.index(row, column),
+                                      [Qt.ItemDataRole.DisplayRole])
+                start = None
+        return len(rows)
+
+    def row_values(self, row) -> List[Any]:
+        """Значения всех колонок строки (новый список, изменения в модель не попадают)"""
+        return self._store.row(row)
+
+    def rows_values(self, rows: List[int]) -> List[List[Any]]:
+        """Значения многих строк сразу"""
+        return self._store.take(rows)
+
+    def row_id(self, row):
+        """ID записи в строке (ID всегда в первой колонке)"""
+        return self._store.get(row, 0)
+
+    def close(self):
+        """Освобождает ресурсы модели при замене на новую"""
+        pass
+
+class PagedTableModel(TableModel):
+    """
+    Модель, читающая vehicles из SQLite страницами по мере прокрутки.
+
+    Страницы выбираются по ключу (значение колонки сортировки, id) последней
+    строки предыдущей страницы, поэтому чтение любой страницы не зависит от ее
+    номера. В памяти держится не больше max_pages страниц, давно не
+    использованные вытесняются и при необходимости читаются заново.
+
+    Фильтры по значениям колонок и сортировка выполняются в SQL (set_filter,
+    sort): после их изменения модель перечитывает только первую страницу.
+    """
+    def __init__(self, db_path: str = 'vehicles.db', page_size: int = 500, max_pages: int = 40):
+        super().__init__()
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self._conn = sqlite3.connect(db_path)
+        
+        columns_info = self._conn.execute("PRAGMA table_info(vehicles)").fetchall()
+        self._headers = [col[1] for col in columns_info]
+        self._column_types = {i: col[2].upper() for i, col in enumerate(columns_info)}
+        
+        self._filters: Dict[int, set] = {}  # Колонка -> допустимые отображаемые значения
+        self._sort_column = 0  # По умолчанию порядок по id
+        self._sort_order = Qt.SortOrder.AscendingOrder
+        self._reload()
+
+    def close(self):
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    def _where(self):
+        """Условие WHERE и параметры по текущим фильтрам"""
+        clauses, params = [], []
+        for column, values in self._filters.items():
+            name = f'"{self._headers[column]}"'
+            # В таблице пустое значение отображается как 'None'
+            parts = []
+            other = [value for value in values if value != 'None']
+            if other:
+                parts.append(f"{name} IN (SELECT value FROM json_each(?))")
+                params.append(json.dumps(other))
+            if 'None' in values:
+                parts.append(f"{name} IS NULL")
+            clauses.append(f"({' OR '.join(parts)})")
+        return clauses, params
+
+    def _after(self, key):
+        """Условие "строка после key" в порядке (колонка сортировки, id) с учетом NULL"""
+        value, row_id = key
+        name = f'"{self._headers[self._sort_column]}"'
+        # NULL в SQLite меньше любого значения
+        if self._sort_order == Qt.SortOrder.AscendingOrder:
+            if value is None:
+                return f"(({name} IS NULL AND id > ?) OR {name} IS NOT NULL)", [row_id]
+            return f"({name} > ? OR ({name} = ? AND id > ?))", [value, value, row_id]
+        if value is None:
+            return f"({name} IS NULL AND id < ?)", [row_id]
+        return f"({name} < ? OR ({name} = ? AND id < ?) OR {name} IS NULL)", [value, value, row_id]
+
+    def _reload(self):
+        """Сбрасывает страницы и читает первую страницу по текущим фильтрам и сортировке"""
+        self.beginResetModel()
+        direction = 'ASC' if self._sort_order == Qt.SortOrder.AscendingOrder else 'DESC'
+        self._order_by = f'"{self._headers[self._sort_column]}" {direction}, id {direction}'
+        clauses, params = self._where()
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        self._total = self._conn.execute(f"SELECT COUNT(*) FROM vehicles {where}", params).fetchone()[0]
+        self._loaded = 0  # Количество строк, уже показанных представлению
+        self._row_by_id = {}  # Для прочитанных страниц ведется сразу при чтении
+        self._page_keys = []  # Номер страницы -> ключ строки, после которой она начинается
+        self._pages = OrderedDict()  # Номер страницы -> строки, в порядке последнего обращения
+        if self._total:
+            self._load_next_page()
+        self.endResetModel()
+
+    def _read_page(self, page: int) -> List[List[Any]]:
+        """Читает страницу из БД и кладет ее в кэш, вытесняя самую старую"""
+        clauses, params = self._where()
+        key = self._page_keys[page]
+        if key is not None:
+            after, after_params = self._after(key)
+            clauses.append(after)
+            params += after_params
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = f"SELECT * FROM vehicles {where} ORDER BY {self._order_by} LIMIT {self.page_size}"
+        rows = [list(row) for row in self._conn.execute(query, params)]
+        self._pages[page] = rows
+        if len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+        return rows
+
+    def _load_next_page(self) -> int:
+        """Читает следующую страницу и возвращает количество прочитанных строк"""
+        page = len(self._page_keys)
+        if page:
+            last = self.row_values(self._loaded - 1)
+            self._page_keys.append((last[self._sort_column], last[0]))
+        else:
+            self._page_keys.append(None)
+        rows = self._read_page(page)
+        self._row_by_id.update((values[0], self._loaded + i) for i, values in enumerate(rows))
+        self._loaded += len(rows)
+        if len(rows) < self.page_size:
+            # Записей больше нет (или часть удалена с момента подсчета)
+            self._total = self._loaded
+        return len(rows)
+
+    def set_filter(self, column, values):
+        """Оставляет строки, у которых отображаемое значение колонки входит в values"""
+        values = set(values) if values else None
+        if self._filters.get(column) == values:
+            return
+        if values:
+            self._filters[column] = values
+        else:
+            self._filters.pop(column, None)
+        self._reload()
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        if column < 0:
+            column, order = 0, Qt.SortOrder.AscendingOrder
+        self._sort_column = column
+        self._sort_order = order
+        self._reload()
+
+    def value_counts(self, column) -> Counter:
+        """Отображаемые значения колонки и число строк с ними среди строк, прошедших фильтры остальных колонок"""
+        filters = self._filters
+        self._filters = {c: v for c, v in filters.items() if c != column}
+        try:
+            clauses, params = self._where()
+        finally:
+            self._filters = filters
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        name = f'"{self._headers[column]}"'
+        counts = Counter()
+        for value, count in self._conn.execute(f"SELECT {name}, COUNT(*) FROM vehicles {where} GROUP BY {name}", params):
+            counts[str(value)] += count
+        return counts
+
+    def rowCount(self, parent):
+        return self._loaded
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and self._loaded < self._total
+
+    def fetchMore(self, parent):
+        if parent.isValid():
+            return
+        count = min(self.page_size, self._total - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        read = self._load_next_page()
+        self.endInsertRows()
+        if read < count:
+            # Часть записей удалили после подсчета: убираем пустой хвост
+            self.beginResetModel()
+            self.endResetModel()
+
+    def row_id(self, row):
+        return self.row_values(row)[0]
+
+    def rows_values(self, rows: List[int]) -> List[List[Any]]:
+        return [list(self.row_values(row)) for row in rows]
+
+    def row_values(self, row) -> List[Any]:
+        page, offset = divmod(row, self.page_size)
+        rows = self._pages.get(page)
+        if rows is None:
+            rows = self._read_page(page)
+        else:
+            self._pages.move_to_end(page)
+        return rows[offset]
+
+    def set_column_values(self, column, values_by_id: Dict[Any, Any]) -> int:
+        if column != self._sort_column and column not in self._filters:
+            return super().set_column_values(column, values_by_id)
+        # Строки могли сменить место в порядке сортировки или перестать
+        # проходить фильтр: перечитываем с начала, как после удаления
+        found = sum(1 for row_id in values_by_id if self.find_row(row_id) is not None)
+        self._reload()
+        return found
+
+    def _set_value(self, row, column, value):
+        # Вытесненная страница при следующем чтении получит значения из БД
+        page, offset = divmod(row, self.page_size)
+        rows = self._pages.get(page)
+        if rows is not None:
+            rows[offset][column] = value
+
+    def data(self, index, role):
+        if role == Qt.ItemDataRole.DisplayRole:
+            return str(self.row_values(index.row())[index.column()])
+        if role == EMPTY_ROLE:
+            return not str(self.row_values(index.row())[index.column()]).strip()
+        return None
+
+    def setData(self, index, value, role):
+        if role == Qt.ItemDataRole.EditRole:
+            self.row_values(index.row())[index.column()] = value
+            return True
+        return False
+
+    def removeRow(self, row):
+        # Удаление сдвигает границы страниц: перечитываем все с начала
+        self._reload()
+        return True
+
+    def remove_rows(self, rows):
+        self._reload()
+
+class DistinctValueIndex:
+    """
+    Уникальные отображаемые значения колонок vehicles с количеством строк.
+
+    Колонка считается из БД одним GROUP BY при первом обращении, дальше
+    поддерживается при редактировании, удалении строк, архивации и
+    синхронизации (apply_deltas). invalidate сбрасывает колонки, изменения
+    которых неизвестны.
+    """
+    def __init__(self, db_path: str = 'vehicles.db'):
+        self.db_path = db_path
+        self._counts: Dict[str, Counter] = {}  # Имя колонки -> значение -> количество строк
+
+    def counts(self, column_name: str) -> Counter:
+        counts = self._counts.get(column_name)
+        if counts is None:
+            counts = Counter()
+            with sqlite3.connect(self.db_path) as conn:
+                query = f'SELECT "{column_name}", COUNT(*) FROM vehicles GROUP BY "{column_name}"'
+                for value, count in conn.execute(query):
+                    counts[str(value)] += count
+            self._counts[column_name] = counts
+        return counts
+
+    def update_value(self, column_name: str, old_value, new_value):
+        """Значение ячейки колонки изменилось с old_value на new_value"""
+        counts = self._counts.get(column_name)
+        if counts is None:
+            return
+        self._decrement(counts, str(old_value))
+        counts[str(new_value)] += 1
+
+    def remove_rows(self, headers: List[str], rows: List[List[Any]]):
+        """Строки rows удалены"""
+        for column, column_name in enumerate(headers):
+            counts = self._counts.get(column_name)
+            if counts is None:
+                continue
+            counts.subtract(str(values[column]) for values in rows)
+            self._drop_empty(counts)
+
+    def apply_deltas(self, deltas: Dict[str, Counter]):
+        """Изменения количества строк: имя колонки -> отображаемое значение -> +/- строк"""
+        for column_name, delta in deltas.items():
+            counts = self._counts.get(column_name)
+            if counts is None:
+                continue
+            counts.update(delta)
+            self._drop_empty(counts)
+
+    def invalidate(self, column_name: Optional[str] = None):
+        """Сбрасывает колонку column_name или, если она не указана, все колонки"""
+        if column_name is None:
+            self._counts.clear()
+        else:
+            self._counts.pop(column_name, None)
+
+    @staticmethod
+    def _decrement(counts: Counter, value: str):
+        counts[value] -= 1
+        if counts[value] <= 0:
+            del counts[value]
+
+    @staticmethod
+    def _drop_empty(counts: Counter):
+        for value in [value for value, count in counts.items() if count <= 0]:
+            del counts[value]
+
+class FilterValuesModel(QAbstractListModel):
+    """Значения колонки с количеством строк и отметками для меню фильтра"""
+    def __init__(self, counts: Dict[str, int], checked=None, parent=None):
+        super().__init__(parent)
+        self._values = sorted(counts)
+        self._counts = counts
+        self._checked = set(checked or ()) & set(counts)
+
+    def rowCount(self, parent=QModelIndex()):
+        return len(self._values)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        value = self._values[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"{value} ({self._counts[value]})"
+        if role == Qt.ItemDataRole.UserRole:
+            return value
+        if role == Qt.ItemDataRole.CheckStateRole:
+            return Qt.CheckState.Checked if value in self._checked else Qt.CheckState.Unchecked
+        return None
+
+    def flags(self, index):
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsUserCheckable
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if role != Qt.ItemDataRole.CheckStateRole:
+            return False
+        if Qt.CheckState(value) == Qt.CheckState.Checked:
+            self._checked.add(self._values[index.row()])
+        else:
+            self._checked.discard(self._values[index.row()])
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def set_checked(self, values, checked: bool):
+        """Отмечает или снимает отметку сразу с многих значений одним сигналом"""
+        if checked:
+            self._checked.update(values)
+        else:
+            self._checked.difference_update(values)
+        if self._values:
+            self.dataChanged.emit(self.index(0), self.index(len(self._values) - 1), [Qt.ItemDataRole.CheckStateRole])
+
+    def checked_values(self) -> set:
+        return set(self._checked)
+
+class FilterValueList(QWidget):
+    """
+    Список значений для меню фильтра с поиском. QListView создает виджеты
+    только для видимых строк, поэтому меню открывается быстро и на колонках
+    с десятками тысяч значений (VIN).
+    """
+    def __init__(self, counts: Dict[str, int], checked=None, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        
+        self.search = QLineEdit()
+        self.search.setPlaceholderText("Поиск")
+        self.search.setStyleSheet("""
+            QLineEdit {
+                background-color: #363A4F;
+                color: white;
+                border: 1px solid #6E738D;
+                padding: 4px;
+            }
+        """)
+        layout.addWidget(self.search)
+        
+        self.values_model = FilterValuesModel(counts, checked, self)
+        self.search_model = QSortFilterProxyModel(self)
+        self.search_model.setSourceModel(self.values_model)
+        self.search_model.setFilterRole(Qt.ItemDataRole.UserRole)
+        self.search_model.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.search.textChanged.connect(self.search_model.setFilterFixedString)
+        
+        self.view = QListView()
+        self.view.setModel(self.search_model)
+        self.view.setUniformItemSizes(True)
+        self.view.setMinimumSize(260, 300)
+        self.view.setStyleSheet("""
+            QListView {
+                background-color: #24273A;
+                color: white;
+                border: none;
+            }
+        """)
+        layout.addWidget(self.view)
+
+    def _visible_values(self) -> List[str]:
+        """Значения, оставшиеся после поиска"""
+        return [self.search_model.index(row, 0).data(Qt.ItemDataRole.UserRole)
+                for row in range(self.search_model.rowCount())]
+
+    def select_all(self):
+        self.values_model.set_checked(self._visible_values(), True)
+
+    def deselect_all(self):
+        self.values_model.set_checked(self._visible_values(), False)
+
+    def checked_values(self) -> set:
+        return self.values_model.checked_values()
+
 class FilterDialog(QDialog):
     def __init__(self, values, current_selected=None, parent=None):
         super().__init__(parent)
@@ -264,17 +793,39 @@ class EditDialog(QDialog):
         return text.replace('\\n', '\n')
 
 class CustomProxyModel(QSortFilterProxyModel):
+    """
+    Фильтр по значениям колонок и сортировка таблицы.
+
+    Для PagedTableModel фильтры и сортировка передаются в модель и выполняются
+    в SQL, прокси при этом пропускает строки без изменений.
+    """
     def __init__(self, parent=None):
         super().__init__(parent)
         self.filters = {}
 
+    def _sql_source(self) -> Optional['PagedTableModel']:
+        """Исходная модель, если фильтры и сортировка выполняются в SQL"""
+        source = self.sourceModel()
+        return source if isinstance(source, PagedTableModel) else None
+
     def set_filter(self, column, values):
+        source = self._sql_source()
+        if source is not None:
+            source.set_filter(column, values)
+            return
         if values:
             self.filters[column] = values
         else:
             self.filters.pop(column, None)
         self.invalidateFilter()
 
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        source = self._sql_source()
+        if source is not None:
+            source.sort(column, order)
+            return
+        super().sort(column, order)
+
     def filterAcceptsRow(self, source_row, source_parent):
         for column, values in self.filters.items():
             value = str(self.sourceModel().data(self.sourceModel().index(source_row, column), Qt.ItemDataRole.DisplayRole))
@@ -340,30 +891,29 @@ class CustomTooltip(QWidget):
         self.raise_()
 
 class EmptyCellDelegate(QStyledItemDelegate):
-    def paint(self, painter, option, index):
-        value = index.data(Qt.ItemDataRole.DisplayRole)
-        if value is None or str(value).strip() == '':
-            # Сохраняем оригинальный цвет фона
-            original_color = option.palette.base().color()
-            # Создаем новый цвет с желтым оттенком
+    """Подсвечивает желтым оттенком ячейки с пустым значением"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # Цвет фона палитры (rgba) -> кисть подсветки, чтобы не смешивать цвета при каждой отрисовке
+        self._empty_brushes: Dict[int, QBrush] = {}
+
+    def empty_brush(self, base: QColor) -> QBrush:
+        brush = self._empty_brushes.get(base.rgba())
+        if brush is None:
+            # Смешиваем цвет фона с желтым с учетом прозрачности
             yellow_color = QColor(255, 255, 0, 30)
-            # Смешиваем цвета с учетом прозрачности
-            mixed_color = QColor(
-                int(original_color.red() * 0.85 + yellow_color.red() * 0.15),
-                int(original_color.green() * 0.85 + yellow_color.green() * 0.15),
-                int(original_color.blue() * 0.85 + yellow_color.blue() * 0.15)
-            )
-            # Создаем новую палитру
-            palette = option.palette
-            palette.setColor(QPalette.ColorRole.Base, mixed_color)
-            option.palette = palette
-            
-            # Рисуем фон
-            painter.fillRect(option.rect, mixed_color)
-            
-            # Рисуем текст
-            if value is not None:
-                painter.drawText(option.rect, Qt.AlignmentFlag.AlignCenter, str(value))
+            brush = QBrush(QColor(
+                int(base.red() * 0.85 + yellow_color.red() * 0.15),
+                int(base.green() * 0.85 + yellow_color.green() * 0.15),
+                int(base.blue() * 0.85 + yellow_color.blue() * 0.15)
+            ))
+            self._empty_brushes[base.rgba()] = brush
+        return brush
+
+    def paint(self, painter, option, index):
+        if index.data(EMPTY_ROLE):
+            # Текст пустой или из пробелов: достаточно залить фон
+            painter.fillRect(option.rect, self.empty_brush(option.palette.base().color()))
         else:
             super().paint(painter, option, index)
 
@@ -373,10 +923,18 @@ class TableWindow(QMainWindow):
         self.setWindowTitle("Просмотр данных")
         self.resize(1200, 800)
         
-        # Словарь для хранения всех уникальных значений по колонкам
-        self.column_values = {}
+        # Уникальные значения колонок с количеством строк для меню фильтров
+        self.value_index = DistinctValueIndex('vehicles.db')
         # Словарь для хранения текущих фильтров
         self.current_filters = {}
+        # Модель данных (TableModel или PagedTableModel), создается в load_data
+        self.model: Optional[TableModel] = None
+        # Фоновая загрузка строк в TableModel
+        self.load_worker: Optional[LoadWorker] = None
+        # Журнал редактирований для отмены: (колонка, новое значение, [(ID, прежнее значение)])
+        self.edit_history = deque(maxlen=UNDO_LIMIT)
+        # Колонки, ширину которых пользователь менял вручную (сохраняются в column_widths)
+        self.resized_columns = set()
         
         # Создаем центральный виджет
         central_widget = QWidget()
@@ -488,10 +1046,19 @@ class TableWindow(QMainWindow):
         # Настройка заголовков
         self.table.horizontalHeader().setStretchLastSection(True)
         self.table.horizontalHeader().setSectionsMovable(True)
+        self.table.horizontalHeader().sectionResized.connect(self.on_section_resized)
         self.table.verticalHeader().setVisible(False)
         
         layout.addWidget(self.table)
         
+        undo_action = QAction("Отменить редактирование", self)
+        undo_action.setShortcut(QKeySequence.StandardKey.Undo)
+        undo_action.triggered.connect(self.undo_edit)
+        self.addAction(undo_action)
+        
+        # Создаем таблицы и применяем миграции, если БД открывается впервые после обновления
+        VehiclesDatabase('vehicles.db').close()
+        
         # Загружаем данные
         self.load_data()
         
@@ -517,8 +1084,13 @@ class TableWindow(QMainWindow):
         self.table.viewport().installEventFilter(self)
         QApplication.instance().installEventFilter(self)
 
-    def load_data(self):
+    def load_data(self, invalidate_index: bool = True):
         try:
+            # Предыдущая загрузка больше не нужна
+            self.stop_loading()
+            # Ширины, измененные пользователем, иначе перезапишутся сохраненными
+            self.save_column_widths()
+            
             db = Database()
             # Получаем заголовки и типы данных
             db.cursor.execute("PRAGMA table_info(vehicles)")
@@ -532,45 +1104,134 @@ class TableWindow(QMainWindow):
                 headers.append(name)
                 column_types[i] = col_type
             
-            # Получаем данные
-            rows = db.fetch_all("SELECT * FROM vehicles")
-            if rows:
-                # Преобразуем в список списков для редактирования
-                data = [list(row) for row in rows]
-                
-                # Собираем уникальные значения для каждой колонки
-                for col_idx, header in enumerate(headers):
-                    self.column_values[col_idx] = sorted(set(str(row[col_idx]) for row in data if row[col_idx] is not None))
+            total = db.fetch_all("SELECT COUNT(*) FROM vehicles")[0][0]
+            # Данные могли измениться: значения фильтров считаем заново, если
+            # изменения неизвестны, а прежние значения в журнале отмены могли устареть
+            if invalidate_index:
+                self.value_index.invalidate()
+            self.edit_history.clear()
+            if total:
+                old_model = self.model
                 
-                # Создаем модель
-                self.model = TableModel(data, headers)
-                self.model.set_column_types(column_types)
+                if total >= LAZY_LOAD_THRESHOLD:
+                    # Большой архив читаем страницами по мере прокрутки
+                    self.model = PagedTableModel('vehicles.db')
+                else:
+                    # Строки добавляются пачками из фонового потока
+                    self.model = TableModel([], headers)
+                    self.model.set_column_types(column_types)
                 
                 # Создаем кастомную прокси-модель
                 self.proxy_model = CustomProxyModel(self)
                 self.proxy_model.setSourceModel(self.model)
                 self.table.setModel(self.proxy_model)
+                # Прежнюю модель закрываем, когда таблица ее уже не читает
+                if old_model is not None:
+                    old_model.close()
                 
                 # Устанавливаем размеры столбцов
-                for column in range(len(headers)):
-                    # Получаем максимальную ширину содержимого в столбце
-                    max_width = len(headers[column]) * 10  # Базовая ширина от заголовка
-                    for row in range(len(data)):
-                        content_width = len(str(data[row][column])) * 8
-                        max_width = max(max_width, content_width)
-                    # Устанавливаем минимальную ширину 150 пикселей
-                    self.table.setColumnWidth(column, max(150, min(max_width, 300)))
+                self.apply_column_widths(db, headers)
                 
                 # Разрешаем сортировку
                 self.table.setSortingEnabled(True)
                 
+                if not isinstance(self.model, PagedTableModel):
+                    self.start_loading(self.model)
+                
             db.close()
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Ошибка загрузки данных: {str(e)}")
+
+    def start_loading(self, model: TableModel):
+        """Запускает фоновое чтение таблицы в model"""
+        self.setWindowTitle("Просмотр данных (загрузка...)")
+        worker = LoadWorker('vehicles.db')
+        worker.rows_loaded.connect(model.append_rows)
+        worker.finished.connect(self.on_load_finished)
+        self.load_worker = worker
+        worker.start()
+
+    def stop_loading(self):
+        """Прерывает фоновую загрузку и дожидается завершения потока"""
+        worker = self.load_worker
+        if worker is None:
+            return
+        self.load_worker = None
+        worker.rows_loaded.disconnect()
+        worker.finished.disconnect()
+        worker.requestInterruption()
+        worker.wait()
+
+    def on_load_finished(self, success: bool, message: str):
+        self.load_worker = None
+        self.setWindowTitle("Просмотр данных")
+        if not success:
+            QMessageBox.critical(self, "Ошибка", message)
+
+    def apply_column_widths(self, db: Database, headers: List[str]):
+        """
+        Ширины колонок: сохраненные с прошлого сеанса, иначе по максимальной
+        длине значений из column_stats, а для колонок без статистики - по
+        первым WIDTH_SAMPLE_ROWS строкам таблицы. Выборка читается из БД:
+        строки в модель к этому моменту еще не загружены
+        """
+        saved = dict(db.fetch_all("SELECT column_name, width FROM column_widths"))
+        max_lengths = dict(db.fetch_all("SELECT column_name, max_len FROM column_stats"))
+        sample = None
+        
+        for column, name in enumerate(headers):
+            width = saved.get(name)
+            if width is None:
+                max_len = max_lengths.get(name)
+                if max_len is None:
+                    if sample is None:
+                        sample = db.fetch_all("SELECT * FROM vehicles LIMIT ?", (WIDTH_SAMPLE_ROWS,)) or []
+                    max_len = max((len(str(row[column])) for row in sample), default=0)
+                # Базовая ширина от заголовка, не уже 150 и не шире 300 пикселей
+                width = max(150, min(max(len(name) * 10, max_len * 8), 300))
+            self.table.setColumnWidth(column, width)
+
+    def is_stretched_section(self, column: int) -> bool:
+        """Колонка растянута до края таблицы (последняя видимая), ее ширина не выбрана пользователем"""
+        header = self.table.horizontalHeader()
+        return header.stretchLastSection() and header.visualIndex(column) == header.count() - 1
+
+    def on_section_resized(self, column: int, old_size: int, new_size: int):
+        """Запоминает колонку, ширину которой пользователь изменил мышью"""
+        # Ширины из apply_column_widths и растяжение последней колонки при
+        # изменении размера окна задаются без нажатой кнопки мыши
+        if self.model is None or QApplication.mouseButtons() == Qt.MouseButton.NoButton:
+            return
+        if not self.is_stretched_section(column):
+            self.resized_columns.add(self.model._headers[column])
+
+    def save_column_widths(self):
+        """Сохраняет ширины колонок, измененные пользователем, для следующего открытия"""
+        if self.model is None or not self.resized_columns:
+            return
+        widths = [(name, self.table.columnWidth(column)) for column, name in enumerate(self.model._headers)
+                  if name in self.resized_columns and not self.is_stretched_section(column)]
+        self.resized_columns.clear()
+        try:
+            with sqlite3.connect('vehicles.db') as conn:
+                conn.executemany("INSERT OR REPLACE INTO column_widths (column_name, width) VALUES (?, ?)", widths)
+        except sqlite3.Error as e:
+            print(f"Ошибка сохранения ширины колонок: {e}")
+
+    def closeEvent(self, event):
+        self.stop_loading()
+        self.save_column_widths()
+        if self.model is not None:
+            # PagedTableModel держит свое соединение с БД
+            self.table.setModel(None)
+            self.model.close()
+        super().closeEvent(event)
+
     def sync_database(self):
         try:
             # Создаем и запускаем поток для синхронизации
             self.sync_worker = SyncWorker()
+            self.sync_worker.values_changed.connect(self.value_index.apply_deltas)
             self.sync_worker.finished.connect(self.on_sync_finished)
             self.sync_worker.start()
             
@@ -580,7 +1241,8 @@ class TableWindow(QMainWindow):
     def on_sync_finished(self, success: bool, message: str):
         if success:
             QMessageBox.information(self, "Успех", message)
-            self.load_data()
+            # Счетчики фильтров уже обновлены по изменениям синхронизации
+            self.load_data(invalidate_index=False)
         else:
             QMessageBox.critical(self, "Ошибка", message)
     def show_context_menu(self, pos):
@@ -615,6 +1277,11 @@ class TableWindow(QMainWindow):
         delete_action = QAction("Удалить", self)
         delete_action.triggered.connect(self.delete_selected)
         menu.addAction(delete_action)
+        
+        if self.edit_history:
+            undo_action = QAction("Отменить редактирование", self)
+            undo_action.triggered.connect(self.undo_edit)
+            menu.addAction(undo_action)
 
         # Добавляем пункт создания документов
         if self.table.selectedIndexes():
@@ -705,9 +1372,10 @@ class TableWindow(QMainWindow):
                 
                 for row in selected_rows:
                     row_data = {}
+                    row_values = source_model.row_values(row)
                     for col in range(source_model.columnCount(None)):
                         header = source_model._headers[col]
-                        value = source_model._data[row][col]
+                        value = row_values[col]
                         row_data[header] = value
                     selected_data.append(row_data)
                 
@@ -716,16 +1384,23 @@ class TableWindow(QMainWindow):
                     return
 
                 # Создаем и запускаем поток для отправки данных
-                worker = DBWorker(selected_data, selected_user_id)
-                worker.finished.connect(lambda success, msg:
-                    QMessageBox.information(self, "Успех", msg) if success 
-                    else QMessageBox.critical(self, "Ошибка", msg))
-                worker.start()
+                self.send_worker = DBWorker(selected_data, selected_user_id)
+                self.send_worker.progress.connect(
+                    lambda sent, total: self.setWindowTitle(f"Просмотр данных (отправлено {sent} из {total})"))
+                self.send_worker.finished.connect(self.on_send_finished)
+                self.send_worker.start()
                 
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Произошла ошибка: {str(e)}")
         
 
+    def on_send_finished(self, success: bool, message: str):
+        self.setWindowTitle("Просмотр данных")
+        if success:
+            QMessageBox.information(self, "Успех", message)
+        else:
+            QMessageBox.critical(self, "Ошибка", message)
+
     def show_filter_menu(self, pos):
         header = self.table.horizontalHeader()
         column = header.logicalIndexAt(pos)
@@ -776,22 +1451,10 @@ class TableWindow(QMainWindow):
         line.setStyleSheet("background-color: #6E738D;")
         layout.addWidget(line)
         
-        # Получаем уникальные значения для колонки
-        unique_values = set()
-        from PyQt6.QtCore import QModelIndex
-        for row in range(self.proxy_model.rowCount(QModelIndex())):
-            source_index = self.proxy_model.mapToSource(self.proxy_model.index(row, column))
-            value = str(self.model.data(source_index, Qt.ItemDataRole.DisplayRole))
-            unique_values.add(value)
-        
-        # Создаем чекбоксы
-        checkboxes = []
-        for value in sorted(unique_values):
-            checkbox = QCheckBox(value)
-            if column in self.current_filters and value in self.current_filters[column]:
-                checkbox.setChecked(True)
-            checkboxes.append(checkbox)
-            layout.addWidget(checkbox)
+        # Значения колонки с количеством строк: по всей таблице из индекса или,
+        # если отфильтрованы другие колонки, только по отобранным строкам
+        value_list = FilterValueList(self.column_value_counts(column), self.current_filters.get(column))
+        layout.addWidget(value_list)
             
         # Кнопки применения
         button_layout = QHBoxLayout()
@@ -808,15 +1471,13 @@ class TableWindow(QMainWindow):
         
         # Обработчики кнопок
         def select_all_clicked():
-            for cb in checkboxes:
-                cb.setChecked(True)
+            value_list.select_all()
                 
         def deselect_all_clicked():
-            for cb in checkboxes:
-                cb.setChecked(False)
+            value_list.deselect_all()
                 
         def apply_filter():
-            selected_values = {cb.text() for cb in checkboxes if cb.isChecked()}
+            selected_values = value_list.checked_values()
             if selected_values:
                 self.current_filters[column] = selected_values
                 self.model.set_column_filtered(column, True)
@@ -838,9 +1499,22 @@ class TableWindow(QMainWindow):
         apply_button.clicked.connect(apply_filter)
         clear_button.clicked.connect(clear_filter)
         
+        value_list.search.setFocus()
         menu.exec(header.mapToGlobal(pos))
 
-    
+    def column_value_counts(self, column) -> Counter:
+        """Значения колонки и количество строк с ними для меню фильтра"""
+        if not any(other != column for other in self.current_filters):
+            return self.value_index.counts(self.model._headers[column])
+        if isinstance(self.model, PagedTableModel):
+            return self.model.value_counts(column)
+        # Фильтр прокси по другим колонкам: считаем по отобранным строкам
+        counts = Counter()
+        for row in range(self.proxy_model.rowCount(QModelIndex())):
+            source_index = self.proxy_model.mapToSource(self.proxy_model.index(row, column))
+            counts[str(self.model.data(source_index, Qt.ItemDataRole.DisplayRole))] += 1
+        return counts
+
 
     def apply_filters(self):
         for column, values in self.current_filters.items():
@@ -869,39 +1543,36 @@ class TableWindow(QMainWindow):
             
         try:
             db = Database()
+            ids_json = json.dumps(processed_ids)
             
-            # Начинаем транзакцию
-            db.execute("BEGIN TRANSACTION")
-            success_count = 0
-            
-            # Обновляем каждую запись
-            for row_id in processed_ids:
-                if db.execute("UPDATE vehicles SET in_archive = 1 WHERE id = ?", (row_id,)):
-                    success_count += 1
-                    
-                    # Обновляем значение в модели
-                    for row in range(self.model.rowCount(None)):
-                        if self.model._data[row][0] == row_id:  # ID всегда в первой колонке
-                            # Находим индекс колонки in_archive
-                            archive_col = self.model._headers.index('in_archive')
-                            self.model._data[row][archive_col] = 1
-                            break
+            # Прежние значения для счетчиков фильтра и один UPDATE на все записи
+            db.begin()
+            previous = db.fetch_all("SELECT in_archive, COUNT(*) FROM vehicles "
+                                    "WHERE id IN (SELECT value FROM json_each(?)) GROUP BY in_archive", (ids_json,))
+            if db.execute("UPDATE vehicles SET in_archive = 1 WHERE id IN (SELECT value FROM json_each(?))",
+                          (ids_json,)):
+                success_count = db.cursor.rowcount
+                db.commit()
+            else:
+                success_count = 0
+                db.rollback()
             
-            # Если были успешные обновления, коммитим транзакцию
             if success_count > 0:
-                db.execute("COMMIT")
-                # Уведомляем модель об изменении данных
-                self.model.layoutChanged.emit()
+                delta = Counter()
+                for value, count in previous:
+                    delta[str(value)] -= count
+                    delta['1'] += count
+                self.value_index.apply_deltas({'in_archive': delta})
+                # Обновляем значения в модели и уведомляем только об измененных ячейках
+                archive_col = self.model._headers.index('in_archive')
+                self.model.set_column_value(processed_ids, archive_col, 1)
                 QMessageBox.information(self, "Результат", 
                                      f"Документы созданы успешно.\nОбновлено записей: {success_count}")
             else:
-                db.execute("ROLLBACK")
                 QMessageBox.warning(self, "Предупреждение", 
                                   "Не удалось обновить статус архивации")
                 
         except Exception as e:
-            if 'db' in locals():
-                db.execute("ROLLBACK")
             QMessageBox.critical(self, "Ошибка", 
                                f"Ошибка при обновлении статуса архивации: {str(e)}")
         finally:
@@ -922,11 +1593,12 @@ class TableWindow(QMainWindow):
         for row in selected_rows:
             row_data = {}
             source_row = self.proxy_model.mapToSource(self.proxy_model.index(row, 0)).row()
+            row_values = self.model.row_values(source_row)
             
             # Собираем данные из всех колонок
             for col in range(self.model.columnCount(None)):
                 header = self.model._headers[col]
-                value = self.model._data[source_row][col]
+                value = row_values[col]
                 
                 # Разбираем сложные поля (если они в JSON формате)
                 if header in ['DVIGATEL', 'TOPLIVO', 'TRANSMISSIYA', 'PODVESKA', 'TORMOZNAYA_SISTEMA', 'GABARITY', 'BAZOVOE_TS', 'SBKTS']:
@@ -951,17 +1623,12 @@ class TableWindow(QMainWindow):
         if not clicked_index:
             return
 
-        # Получаем все выделенные индексы
-        selected_indexes = self.table.selectedIndexes()
-        if not selected_indexes:
-            return
-
         # Определяем столбец для редактирования из кликнутой ячейки
         clicked_column = clicked_index.column()
         
-        # Фильтруем только индексы из нужного столбца
-        column_indexes = [idx for idx in selected_indexes if idx.column() == clicked_column]
-        if not column_indexes:
+        # Строки, в которых выделен нужный столбец
+        rows = self.selected_rows(clicked_column)
+        if not rows:
             return
 
         # Получаем текущее значение из кликнутой ячейки
@@ -974,7 +1641,6 @@ class TableWindow(QMainWindow):
             new_value = dialog.get_value()
             
             try:
-                db = Database()
                 column_name = self.model._headers[clicked_column]
                 column_type = self.model._column_types.get(clicked_column, 'TEXT')
                 
@@ -993,57 +1659,74 @@ class TableWindow(QMainWindow):
                                      f"Неверный формат данных. Ожидается {column_type}")
                     return
                 
-                # Защищаем имя колонки от SQL инъекций
-                safe_column_name = f"`{column_name}`"
+                # Прежние значения нужны для журнала отмены и индекса значений фильтров
+                old_values = []
+                for row in rows:
+                    row_values = self.model.row_values(self.proxy_model.mapToSource(self.proxy_model.index(row, 0)).row())
+                    old_values.append((row_values[0], row_values[clicked_column]))
                 
-                # Начинаем транзакцию
-                db.execute("BEGIN TRANSACTION")
-                success_count = 0
-                error_count = 0
-                
-                try:
-                    # Обновляем каждую выбранную ячейку
-                    for proxy_idx in column_indexes:
-                        source_idx = self.proxy_model.mapToSource(proxy_idx)
-                        row_id = self.model._data[source_idx.row()][0]  # ID всегда в первой колонке
-                        
-                        # Обновляем значение в БД
-                        query = f"UPDATE vehicles SET {safe_column_name} = ? WHERE id = ?"
-                        if db.execute(query, (converted_value, row_id)):
-                            # Обновляем значение в модели
-                            self.model.setData(source_idx, converted_value, Qt.ItemDataRole.EditRole)
-                            success_count += 1
-                        else:
-                            error_count += 1
-                    
-                    # Если были успешные обновления, коммитим транзакцию
-                    if success_count > 0:
-                        db.execute("COMMIT")
-                        # Уведомляем модель об изменении данных
-                        self.model.dataChanged.emit(
-                            self.model.index(0, clicked_column),
-                            self.model.index(self.model.rowCount(None)-1, clicked_column)
-                        )
-                        
-                        msg = f"Обновлено успешно: {success_count}"
-                        if error_count > 0:
-                            msg += f"\nОшибок: {error_count}"
-                        QMessageBox.information(self, "Результат", msg)
-                    else:
-                        db.execute("ROLLBACK")
-                        QMessageBox.warning(self, "Предупреждение", "Не удалось обновить данные")
-                        
-                except Exception as e:
-                    db.execute("ROLLBACK")
-                    raise e
-                    
-                finally:
-                    db.close()
+                success_count = self.write_column_values(
+                    column_name, [(row_id, converted_value) for row_id, _ in old_values])
+                if success_count > 0:
+                    self.edit_history.append((column_name, converted_value, old_values))
+                    for _, old_value in old_values:
+                        self.value_index.update_value(column_name, old_value, converted_value)
+                    QMessageBox.information(self, "Результат", f"Обновлено успешно: {success_count}")
+                else:
+                    QMessageBox.warning(self, "Предупреждение", "Не удалось обновить данные")
                     
             except Exception as e:
                 QMessageBox.critical(self, "Ошибка", f"Ошибка обновления данных: {str(e)}")
                 print(f"Ошибка при обновлении: {str(e)}")
 
+    def write_column_values(self, column_name: str, changes: List[Tuple[Any, Any]]) -> int:
+        """
+        Записывает пары (ID, значение) колонки в БД одной транзакцией и
+        обновляет только затронутые строки модели. Возвращает число измененных записей
+        """
+        db = Database()
+        try:
+            db.begin()
+            count = db.update_values(column_name, changes)
+            # Новые значения могут быть длиннее известного максимума колонки
+            max_len = max(len(str(value)) for _, value in changes)
+            db.execute("UPDATE column_stats SET max_len = MAX(max_len, ?) WHERE column_name = ?",
+                       (max_len, column_name))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        
+        self.model.set_column_values(self.model._headers.index(column_name), dict(changes))
+        return count
+
+    def undo_edit(self):
+        """Возвращает прежние значения ячеек последнего редактирования"""
+        if not self.edit_history:
+            return
+        column_name, new_value, old_values = self.edit_history.pop()
+        try:
+            self.write_column_values(column_name, old_values)
+            for _, old_value in old_values:
+                self.value_index.update_value(column_name, new_value, old_value)
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Ошибка отмены редактирования: {str(e)}")
+
+    def forget_edits(self, ids):
+        """
+        Убирает удаленные записи из журнала отмены: их значения уже вычтены
+        из индекса значений фильтров, а отменять правку для них нечего
+        """
+        deleted = set(ids)
+        history = []
+        for column_name, new_value, old_values in self.edit_history:
+            old_values = [(row_id, old_value) for row_id, old_value in old_values if row_id not in deleted]
+            if old_values:
+                history.append((column_name, new_value, old_values))
+        self.edit_history = deque(history, maxlen=UNDO_LIMIT)
+
     def copy_selected(self):
         indexes = self.table.selectedIndexes()
         if not indexes:
@@ -1064,15 +1747,21 @@ class TableWindow(QMainWindow):
         
         QApplication.clipboard().setText("\n".join(text))
 
+    def selected_rows(self, column: Optional[int] = None) -> set:
+        """
+        Строки прокси-модели из диапазонов выделения, не перебирая каждую
+        ячейку. Если указана column - только строки, где выделена эта колонка
+        """
+        rows = set()
+        for selection_range in self.table.selectionModel().selection():
+            if column is None or selection_range.left() <= column <= selection_range.right():
+                rows.update(range(selection_range.top(), selection_range.bottom() + 1))
+        return rows
+
     def delete_selected(self):
-        indexes = self.table.selectedIndexes()
-        if not indexes:
+        rows = self.selected_rows()
+        if not rows:
             return
-
-        # Получаем уникальные строки
-        rows = set()
-        for index in indexes:
-            rows.add(index.row())
             
         if QMessageBox.question(self, "Подтверждение", 
                               f"Удалить выбранные записи ({len(rows)})?",
@@ -1080,36 +1769,41 @@ class TableWindow(QMainWindow):
             return
 
         try:
-            db = Database()
+            # Запоминаем строки модели и их значения до удаления
+            source_rows = [self.proxy_model.mapToSource(self.proxy_model.index(row, 0)).row() for row in rows]
+            targets = list(zip(source_rows, self.model.rows_values(source_rows)))
+            ids = [row_values[0] for _, row_values in targets]  # ID всегда в первой колонке
             
-            # Начинаем транзакцию
-            db.execute("BEGIN TRANSACTION")
-            success_count = 0
-            
-            # Удаляем записи
-            for row in sorted(rows, reverse=True):
-                source_row = self.proxy_model.mapToSource(self.proxy_model.index(row, 0)).row()
-                row_id = self.model._data[source_row][0]  # ID всегда в первой колонке
-                
-                if db.execute("DELETE FROM vehicles WHERE id = ?", (row_id,)):
-                    self.model.removeRow(source_row)
-                    success_count += 1
+            db = Database()
+            try:
+                # Все записи удаляются в одной транзакции, порциями по DELETE_CHUNK_SIZE
+                db.begin()
+                success_count = 0
+                for start in range(0, len(ids), DELETE_CHUNK_SIZE):
+                    chunk = ids[start:start + DELETE_CHUNK_SIZE]
+                    if not db.execute(f"DELETE FROM vehicles WHERE id IN ({', '.join('?' * len(chunk))})", chunk):
+                        db.rollback()
+                        QMessageBox.warning(self, "Предупреждение", "Не удалось удалить записи")
+                        return
+                    success_count += db.cursor.rowcount
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
             
-            # Если были успешные удаления, коммитим транзакцию
+            self.value_index.remove_rows(self.model._headers, [row_values for _, row_values in targets])
+            self.model.remove_rows(source_row for source_row, _ in targets)
+            self.forget_edits(ids)
+
             if success_count > 0:
-                db.execute("COMMIT")
                 QMessageBox.information(self, "Результат", f"Удалено записей: {success_count}")
             else:
-                db.execute("ROLLBACK")
                 QMessageBox.warning(self, "Предупреждение", "Не удалось удалить записи")
             
-            db.close()
-            
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Ошибка удаления данных: {str(e)}")
-            if 'db' in locals():
-                db.execute("ROLLBACK")
-                db.close()
 
     def show_tooltip(self):
         """Показывает подсказку для текущей ячейки"""
@@ -0,0 +1,127 @@
+import hashlib
+import logging
+import sqlite3
+import time
+from typing import Optional
+
+
+class TextCache:
+    """
+    Дисковый кэш очищенного текста PDF.
+
+    Ключ - SHA-256 содержимого файла, поэтому переименованный или перемещенный
+    файл берется из кэша, а измененный - извлекается заново. Записи с другой
+    версией очистки текста удаляются при открытии кэша. Суммарный размер
+    текстов ограничен max_bytes, первыми вытесняются давно не читавшиеся записи.
+    """
+
+    def __init__(self, db_path: str = 'pdf_text_cache.db', version: str = '',
+                 max_bytes: int = 256 * 1024 * 1024):
+        self.db_path = db_path
+        self.version = version
+        self.max_bytes = max_bytes
+        self._conn: Optional[sqlite3.Connection] = None
+        self.logger = logging.getLogger(__name__)
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Открывает кэш при первом обращении, создает таблицу и сбрасывает устаревшие записи"""
+        if self._conn is None:
+            # Кэш используют несколько процессов пула: WAL и ожидание блокировки
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Потеря последних записей при сбое питания для кэша не страшна
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pdf_text (
+                    key TEXT PRIMARY KEY,
+                    version TEXT,
+                    text TEXT,
+                    size INTEGER,
+                    last_used REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_pdf_text_last_used ON pdf_text (last_used)")
+            # Суммарный размер текстов ведут триггеры, чтобы не считать SUM(size)
+            # после каждой записи. Создается в одной транзакции с подсчетом
+            # начального значения, пока другие процессы не пишут в кэш
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("CREATE TABLE IF NOT EXISTS pdf_text_size (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER)")
+                conn.execute("INSERT OR IGNORE INTO pdf_text_size (id, total) SELECT 0, COALESCE(SUM(size), 0) FROM pdf_text")
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS pdf_text_size_insert AFTER INSERT ON pdf_text
+                    BEGIN UPDATE pdf_text_size SET total = total + NEW.size; END
+                """)
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS pdf_text_size_update AFTER UPDATE OF size ON pdf_text
+                    BEGIN UPDATE pdf_text_size SET total = total - OLD.size + NEW.size; END
+                """)
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS pdf_text_size_delete AFTER DELETE ON pdf_text
+                    BEGIN UPDATE pdf_text_size SET total = total - OLD.size; END
+                """)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            removed = conn.execute("DELETE FROM pdf_text WHERE version != ?", (self.version,)).rowcount
+            if removed:
+                self.logger.info(f"Кэш текста PDF: удалено {removed} записей старой версии")
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @staticmethod
+    def file_key(pdf_path: str, variant: str = '') -> str:
+        """Ключ кэша: хэш содержимого файла и вариант извлечения"""
+        digest = hashlib.sha256()
+        with open(pdf_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return f"{digest.hexdigest()}:{variant}" if variant else digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Текст из кэша или None. Время последнего обращения обновляется"""
+        conn = self._get_connection()
+        row = conn.execute("SELECT text FROM pdf_text WHERE key = ? AND version = ?",
+                           (key, self.version)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE pdf_text SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def put(self, key: str, text: str):
+        """Сохраняет текст и вытесняет старые записи, если кэш превысил max_bytes"""
+        conn = self._get_connection()
+        size = len(text.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        # Не INSERT OR REPLACE: замена строки не вызывает триггер удаления
+        conn.execute(
+            """INSERT INTO pdf_text (key, version, text, size, last_used) VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT (key) DO UPDATE SET
+                   version = excluded.version, text = excluded.text,
+                   size = excluded.size, last_used = excluded.last_used""",
+            (key, self.version, text, size, time.time())
+        )
+        self._evict()
+
+    def _evict(self):
+        """Удаляет записи в порядке давности обращения, пока размер кэша больше max_bytes"""
+        conn = self._get_connection()
+        total = conn.execute("SELECT total FROM pdf_text_size").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = []
+        for key, size in conn.execute("SELECT key, size FROM pdf_text ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM pdf_text WHERE key = ?", evicted)
+        self.logger.info(f"Кэш текста PDF: вытеснено {len(evicted)} записей")